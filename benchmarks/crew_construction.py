@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+Per-request crew construction overhead: `TaleWeaver().crew()` (YAML parsing, agents,
+tools and tasks built from scratch) against `get_crew_factory().crew()` (copy of a
+template built once per process). No LLM is called.
+
+Usage:
+    python benchmarks/crew_construction.py [iterations]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from tale_weaver.crew import CrewFactory, TaleWeaver  # noqa: E402
+
+
+def timed(build, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        build()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    factory = CrewFactory()
+
+    start = time.perf_counter()
+    factory.crew()
+    factory.story_crew()
+    warmup = (time.perf_counter() - start) * 1000
+
+    rows = [
+        ("TaleWeaver().crew()", timed(lambda: TaleWeaver().crew(), iterations)),
+        ("factory.crew()", timed(factory.crew, iterations)),
+        ("TaleWeaver().story_crew()", timed(lambda: TaleWeaver().story_crew(), iterations)),
+        ("factory.story_crew()", timed(factory.story_crew, iterations)),
+    ]
+    print(f"factory warm-up (templates): {warmup:.1f} ms")
+    for name, (median, worst) in rows:
+        print(f"{name:<28} median {median:7.2f} ms   max {worst:7.2f} ms")
+    print(f"saved per request: {rows[0][1][0] - rows[1][1][0]:.2f} ms (crew), "
+          f"{rows[2][1][0] - rows[3][1][0]:.2f} ms (story crew)")
+
+
+if __name__ == "__main__":
+    main()
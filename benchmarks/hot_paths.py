@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+Offline benchmark of the image composition, PDF export and flipbook hot paths.
+
+Synthetic storybooks (1-100 pages, 1-12 characters, several image sizes) are
+illustrated once with the offline image backend; then each stage runs in a fresh
+interpreter, so its peak RSS is its own:
+
+  merge        character reference montages of every scene and of the cover
+               (`IllustrationTool._build_labeled_merge`, montage store bypassed)
+  pdf          `generate_storybook_pdf`
+  pdf_optimized  `export_storybook_pdf` (resampled JPEG illustrations)
+  pdf_streaming  `stream_storybook_pdf` from a page iterator, single pass
+  pdf_chunked    `stream_storybook_pdf` in chunks of 10 pages, assembled at the end
+  pages        `build_pages` of the storybook
+  spreads      `spread_html` of every spread, images inlined as data URIs
+  display      `DisplayAssets.build_book` (display-size derivatives, cold)
+
+Each stage reports its median wall time, the peak RSS of its process and the bytes
+it produced. A first run of every stage is discarded (it warms the parchment texture
+cache and the OS file cache).
+
+Results can be saved as a baseline and compared against one: the command exits with
+status 1 when a stage is slower, uses more memory or produces more bytes than the
+baseline by more than the given thresholds.
+
+Usage:
+    python benchmarks/hot_paths.py [--scenarios small,medium] [--stages merge,pdf]
+                                   [--repeat 3] [--output results.json]
+                                   [--save-baseline baseline.json]
+                                   [--baseline baseline.json] [--time-threshold 0.25]
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+# name: (pages, characters, image size)
+SCENARIOS = {
+    "tiny": (1, 1, (512, 724)),
+    "small": (10, 3, (724, 1024)),
+    "medium": (30, 6, (724, 1024)),
+    "large": (100, 12, (724, 1024)),
+    "hires": (10, 4, (1448, 2048)),
+}
+DEFAULT_SCENARIOS = ["tiny", "small", "medium", "hires"]
+STAGES = ["merge", "pdf", "pdf_optimized", "pdf_streaming", "pdf_chunked", "pages", "spreads", "display"]
+
+
+# ---------- stages (run in the child process) ----------
+
+def _merge(book: dict, workdir: str) -> int:
+    from tale_weaver.tools.custom_tool import IllustrationTool
+
+    tool = IllustrationTool()
+    characters = {name: c["character_image_path"] for name, c in book["characters"].items()}
+    sets = {tuple(sorted(p["characters"])) for p in book["pages"]} | {tuple(sorted(characters))}
+    total = 0
+    for n, names in enumerate(sorted(sets)):
+        path = tool._build_labeled_merge([characters[name] for name in names], f"merge_{n}.png")
+        total += os.path.getsize(path)
+    return total
+
+
+def _pdf(book: dict, workdir: str) -> int:
+    from tale_weaver.utils.pdf_generator import generate_storybook_pdf
+
+    path = os.path.join(workdir, "book.pdf")
+    generate_storybook_pdf(book, path)
+    return os.path.getsize(path)
+
+
+def _pdf_optimized(book: dict, workdir: str) -> int:
+    from tale_weaver.utils.pdf_generator import export_storybook_pdf
+
+    return export_storybook_pdf(book, os.path.join(workdir, "book-optimized.pdf")).output_bytes
+
+
+def _pdf_streaming(book: dict, workdir: str, chunk_pages: int = 0) -> int:
+    from tale_weaver.utils.pdf_generator import stream_storybook_pdf
+
+    pages = (page for page in book["pages"])
+    return stream_storybook_pdf(pages, os.path.join(workdir, f"book-streaming-{chunk_pages}.pdf"),
+                                title=book["storybook_title"], cover_path=book["storybook_image_path"],
+                                chunk_pages=chunk_pages).output_bytes
+
+
+def _pdf_chunked(book: dict, workdir: str) -> int:
+    return _pdf_streaming(book, workdir, chunk_pages=10)
+
+
+def _pages(book: dict, workdir: str) -> int:
+    from tale_weaver.utils.flipbook import build_pages
+
+    return len(json.dumps(build_pages(book)).encode("utf-8"))
+
+
+def _spreads(book: dict, workdir: str) -> int:
+    from tale_weaver.utils.flipbook import build_pages, spread_html
+
+    pages = build_pages(book)
+    return sum(len(spread_html(pages, current).encode("utf-8")) for current in range(1, len(pages) + 1, 2))
+
+
+def _display(book: dict, workdir: str) -> int:
+    from tale_weaver.utils.flipbook import DisplayAssets
+
+    directory = tempfile.mkdtemp(dir=workdir)
+    DisplayAssets(directory).build_book(book)
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+_STAGE_FUNCTIONS = {"merge": _merge, "pdf": _pdf, "pdf_optimized": _pdf_optimized, "pdf_streaming": _pdf_streaming,
+                    "pdf_chunked": _pdf_chunked, "pages": _pages, "spreads": _spreads, "display": _display}
+_STAGE_MODULES = {"merge": "tale_weaver.tools.custom_tool", "pdf": "tale_weaver.utils.pdf_generator",
+                  "pdf_optimized": "tale_weaver.utils.pdf_generator", "pdf_streaming": "tale_weaver.utils.pdf_generator",
+                  "pdf_chunked": "tale_weaver.utils.pdf_generator", "pages": "tale_weaver.utils.flipbook",
+                  "spreads": "tale_weaver.utils.flipbook", "display": "tale_weaver.utils.flipbook"}
+
+
+def _peak_rss_bytes() -> int:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_child(stage: str, book_path: str, workdir: str) -> None:
+    """Run one stage and print its measurements as JSON (child process entry point)."""
+    sys.path.insert(0, SRC)
+    with open(book_path, "r", encoding="utf-8") as f:
+        book = json.load(f)
+    function = _STAGE_FUNCTIONS[stage]
+    # Import the stage's module before the timer starts: import time is measured by startup.py
+    importlib.import_module(_STAGE_MODULES[stage])
+    rss_before = _peak_rss_bytes()
+    start = time.perf_counter()
+    output_bytes = function(book, workdir)
+    wall = time.perf_counter() - start
+    print(json.dumps({"wall_s": wall, "peak_rss_bytes": _peak_rss_bytes(), "rss_before_bytes": rss_before,
+                      "output_bytes": output_bytes}))
+
+
+# ---------- driver ----------
+
+def _env(workdir: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([SRC, env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+    # Keep every cache and output of the benchmark out of the real output directory
+    env["OUTPUT_DIR"] = workdir
+    env["CACHE_DIR"] = os.path.join(workdir, ".cache")
+    env.pop("TRACE_FILE", None)
+    env.pop("TRACE_METRICS_FILE", None)
+    return env
+
+
+def make_book(scenario: str, directory: str) -> str:
+    """Illustrate the synthetic storybook of `scenario` offline; return its JSON path."""
+    sys.path.insert(0, SRC)
+    from tale_weaver.tools.image_backend import LocalImageBackend
+    from tale_weaver.utils.synthetic import synthetic_storybook
+
+    pages, characters, size = SCENARIOS[scenario]
+    backend = LocalImageBackend(size=size)
+    book = synthetic_storybook(pages, characters, title=f"Benchmark {scenario}")
+
+    def image(name: str, prompt: str) -> str:
+        path = os.path.join(directory, f"img_{name}.png")
+        with open(path, "wb") as f:
+            f.write(backend.generate(prompt))
+        return path
+
+    for name, character in book.characters.items():
+        character.character_image_path = image(f"character_{name}", character.character_prompt)
+    for n, page in enumerate(book.pages, 1):
+        page.scene_image_path = image(f"scene_{n}", page.scene_prompt)
+    book.storybook_image_path = image("cover", book.storybook_prompt)
+    book_path = os.path.join(directory, "book.json")
+    with open(book_path, "w", encoding="utf-8") as f:
+        json.dump(book.model_dump(), f)
+    return book_path
+
+
+def measure(stage: str, book_path: str, workdir: str, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat + 1):
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", stage, book_path, workdir],
+                              capture_output=True, text=True, env=_env(workdir), cwd=ROOT)
+        if proc.returncode != 0:
+            return {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    runs = runs[1:]  # warm-up run discarded
+    return {
+        "wall_ms": statistics.median(r["wall_s"] for r in runs) * 1000,
+        "wall_ms_max": max(r["wall_s"] for r in runs) * 1000,
+        "peak_rss_mb": max(r["peak_rss_bytes"] for r in runs) / (1024 * 1024),
+        "stage_rss_mb": max(r["peak_rss_bytes"] - r["rss_before_bytes"] for r in runs) / (1024 * 1024),
+        "output_bytes": runs[-1]["output_bytes"],
+        "runs": len(runs),
+    }
+
+
+def compare(results: dict, baseline: dict, args) -> list:
+    """Regressions of `results` against `baseline`, as printable lines."""
+    checks = [("wall_ms", args.time_threshold, args.min_time_ms),
+              ("peak_rss_mb", args.rss_threshold, args.min_rss_mb),
+              ("output_bytes", args.bytes_threshold, 0)]
+    regressions = []
+    for key, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(key)
+        if not previous or "error" in previous:
+            continue
+        if "error" in current:
+            regressions.append(f"{key}: failed ({current['error']})")
+            continue
+        for metric, threshold, floor in checks:
+            old, new = previous[metric], current[metric]
+            if new - old > max(floor, old * threshold):
+                regressions.append(f"{key} {metric}: {old:.1f} -> {new:.1f} (+{(new - old) / max(old, 1e-9):.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--child", nargs=3, metavar=("STAGE", "BOOK", "WORKDIR"), help=argparse.SUPPRESS)
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS),
+                        help=f"comma-separated, among {', '.join(SCENARIOS)} (or 'all')")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated, among {', '.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="measured runs per stage")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline")
+    parser.add_argument("--baseline", help="compare against this baseline; exit 1 on regression")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="allowed wall time increase (ratio)")
+    parser.add_argument("--rss-threshold", type=float, default=0.20, help="allowed peak RSS increase (ratio)")
+    parser.add_argument("--bytes-threshold", type=float, default=0.05, help="allowed output size increase (ratio)")
+    parser.add_argument("--min-time-ms", type=float, default=5.0, help="ignore wall time increases below this")
+    parser.add_argument("--min-rss-mb", type=float, default=8.0, help="ignore peak RSS increases below this")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    scenarios = list(SCENARIOS) if args.scenarios == "all" else args.scenarios.split(",")
+    stages = args.stages.split(",")
+    unknown = [s for s in scenarios if s not in SCENARIOS] + [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown scenario or stage: {', '.join(unknown)}")
+
+    results = {"python": sys.version.split()[0], "platform": sys.platform, "repeat": args.repeat, "stages": {}}
+    for scenario in scenarios:
+        pages, characters, size = SCENARIOS[scenario]
+        with tempfile.TemporaryDirectory() as workdir:
+            book_path = make_book(scenario, workdir)
+            print(f"{scenario}: {pages} pages, {characters} characters, {size[0]}x{size[1]} images")
+            for stage in stages:
+                entry = measure(stage, book_path, workdir, args.repeat)
+                results["stages"][f"{scenario}/{stage}"] = entry
+                if "error" in entry:
+                    print(f"  {stage:<14} error: {entry['error']}")
+                    continue
+                print(f"  {stage:<14} {entry['wall_ms']:9.1f} ms   peak RSS {entry['peak_rss_mb']:7.1f} MB "
+                      f"(+{entry['stage_rss_mb']:.1f})   {entry['output_bytes'] / 1024:9.1f} KB")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args)
+        if regressions:
+            print(f"{len(regressions)} regressions against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regression against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
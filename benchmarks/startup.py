@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Startup and rerun cost of the Tale Weaver modules and of the Streamlit viewer.
+
+Measures, each in a fresh interpreter:
+  - the cumulative import time (`python -X importtime`) of the main modules, with
+    the heaviest imports each one pulls in;
+  - the cold first run of `src/app.py` and the latency of reruns while flipping
+    the pages of a synthetic storybook (Streamlit AppTest; skipped when Streamlit
+    is not installed).
+
+Usage:
+    python benchmarks/startup.py [--reruns 20] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+MODULES = [
+    "tale_weaver.utils.flipbook",
+    "tale_weaver.utils.library",
+    "tale_weaver.utils.storybook_io",
+    "tale_weaver.tools.custom_tool",
+    "tale_weaver.crew",
+    "tale_weaver.streaming",
+]
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([SRC, env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+    return env
+
+
+def import_cost(module: str, top: int = 5) -> dict:
+    """Cumulative import time of `module` in a fresh interpreter, and its heaviest imports."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, env=_env(), cwd=ROOT)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        return {"module": module, "error": proc.stderr.strip().splitlines()[-1]}
+    entries = []
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    total = next((c for n, _, c in entries if n == module), sum(s for _, s, _ in entries))
+    # Heaviest third-party packages: largest cumulative time per top-level package name
+    packages = {}
+    for name, _, cumulative in entries:
+        package = name.split(".")[0]
+        if package != module.split(".")[0]:
+            packages[package] = max(packages.get(package, 0), cumulative)
+    top_level = sorted(packages.items(), key=lambda e: -e[1])[:top]
+    return {"module": module, "import_ms": total / 1000, "interpreter_ms": wall * 1000,
+            "heaviest": [{"module": n, "ms": c / 1000} for n, c in top_level]}
+
+
+def _synthetic_book(directory: str, pages: int) -> dict:
+    """A storybook whose illustrations are written by the offline image backend."""
+    sys.path.insert(0, SRC)
+    from tale_weaver.tools.image_backend import LocalImageBackend
+    from tale_weaver.utils.synthetic import synthetic_storybook
+
+    backend = LocalImageBackend(latency=0, jitter=0, error_rate=0)
+    book = synthetic_storybook(pages, 3, title="Startup Benchmark")
+
+    def image(name: str, prompt: str) -> str:
+        path = os.path.join(directory, f"{name}.png")
+        with open(path, "wb") as f:
+            f.write(backend.generate(prompt))
+        return path
+
+    book.storybook_image_path = image("cover", book.storybook_prompt)
+    for n, page in enumerate(book.pages, 1):
+        page.scene_image_path = image(f"scene_{n}", page.scene_prompt)
+    data = book.model_dump()
+    with open(os.path.join(directory, "Startup Benchmark.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    return data
+
+
+def viewer_cost(reruns: int, pages: int) -> dict:
+    """Cold run of the app, then rerun latency while paging through a storybook."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return {"skipped": "streamlit is not installed"}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        os.environ["OUTPUT_DIR"] = output_dir
+        data = _synthetic_book(output_dir, pages)
+        from tale_weaver.utils.flipbook import build_pages
+
+        app = AppTest.from_file(os.path.join(SRC, "app.py"), default_timeout=120)
+        start = time.perf_counter()
+        app.run()
+        cold = time.perf_counter() - start
+
+        book_pages = build_pages(data)
+        app.session_state["api_result"] = data
+        app.session_state["book_key"] = "startup-benchmark"
+        app.session_state["pages"] = book_pages
+        app.session_state["total_pages"] = len(book_pages)
+        app.session_state["page"] = 1
+        app.session_state["submitted"] = True
+        start = time.perf_counter()
+        app.run()
+        open_book = time.perf_counter() - start
+
+        timings = []
+        for _ in range(reruns):
+            button = "next" if app.session_state["page"] < len(book_pages) else "prev"
+            if button == "prev" and app.session_state["page"] <= 1:
+                break
+            start = time.perf_counter()
+            app.button(key=button).click().run()
+            timings.append(time.perf_counter() - start)
+            if app.session_state["page"] >= len(book_pages):
+                app.session_state["page"] = 1
+        timings.sort()
+    return {
+        "cold_run_ms": cold * 1000,
+        "open_book_ms": open_book * 1000,
+        "rerun_ms_median": timings[len(timings) // 2] * 1000 if timings else None,
+        "rerun_ms_max": timings[-1] * 1000 if timings else None,
+        "reruns": len(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=20, help="page flips to time")
+    parser.add_argument("--pages", type=int, default=10, help="pages of the synthetic storybook")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "imports": [import_cost(m) for m in MODULES],
+               "viewer": viewer_cost(args.reruns, args.pages)}
+
+    for entry in results["imports"]:
+        if "error" in entry:
+            print(f"{entry['module']:<34} error: {entry['error']}")
+            continue
+        heaviest = ", ".join(f"{h['module']} {h['ms']:.0f}ms" for h in entry["heaviest"][:3])
+        print(f"{entry['module']:<34} {entry['import_ms']:8.1f} ms   ({heaviest})")
+    viewer = results["viewer"]
+    if "skipped" in viewer:
+        print(f"viewer: skipped ({viewer['skipped']})")
+    else:
+        print(f"viewer: cold run {viewer['cold_run_ms']:.0f} ms, open book {viewer['open_book_ms']:.0f} ms, "
+              f"rerun median {viewer['rerun_ms_median']:.1f} ms (max {viewer['rerun_ms_max']:.1f} ms)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
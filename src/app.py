@@ -1,18 +1,30 @@
-import base64
+import hashlib
 import json
+import math
 import streamlit as st
 import warnings
-import tale_weaver.utils.pdf_generator as pdf
 import os
+import time
+import urllib.request
 
-from dotenv import load_dotenv
+from datetime import datetime
 from html import escape
 from pathlib import Path
-from tale_weaver.crew import TaleWeaver
+from tale_weaver.utils.flipbook import (DisplayAssets, build_pages, image_page_html, spread_html,
+                                        spread_image_paths, text_page_html, to_data_uri)
+from tale_weaver.utils.env import load_env
+from tale_weaver.utils.library import StorybookLibrary, get_library
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
-load_dotenv()
+# Streamlit re-executes this script on every interaction: .env is read once per process,
+# and the crew (crewai, LLM clients) and the PDF export (ReportLab) are imported on first use
+load_env()
+
+# When set, storybooks are generated by the standalone service (`serve`) instead of in
+# this script thread: the job survives reruns and page refreshes (its id is kept in the URL)
+SERVICE_URL = os.getenv("TALE_WEAVER_SERVICE_URL", "").rstrip("/")
+SERVICE_POLL_SECONDS = 1.0
 
 st.set_page_config(page_title="Tale Weaver", layout="wide")
 
@@ -90,76 +102,130 @@ h1 { margin-top: 0px !important; margin-bottom: 0.75rem !important; }
 st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
 # ---------- Helpers ----------
-def to_data_uri(img_path: str):
-    if not img_path:
-        return None
-    p = Path(img_path)
-    if not p.exists():
-        return None
-    ext = p.suffix.lower().replace(".", "")
-    if ext not in {"png","jpg","jpeg","webp","gif"}:
-        ext = "png"
-    try:
-        with open(p, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode("utf-8")
-            return f"data:image/{ext};base64,{b64}"
-    except Exception:
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+LIBRARY_PAGE_SIZE = int(os.getenv("LIBRARY_PAGE_SIZE", "20"))
+
+@st.cache_resource
+def display_assets() -> DisplayAssets:
+    return DisplayAssets.from_env(os.path.join(STATIC_DIR, "flipbook"))
+
+def static_serving() -> bool:
+    return bool(st.get_option("server.enableStaticServing"))
+
+def image_src(img_path: str):
+    """Display-size derivative of the image: static URL when static serving is on, small data URI otherwise."""
+    derivative = display_assets().derivative(img_path)
+    if derivative is None:
         return None
+    if static_serving():
+        return f"app/static/flipbook/{os.path.basename(derivative)}"
+    return to_data_uri(derivative)
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def cached_spread_html(book_key: str, current_page: int, _pages) -> str:
+    html = spread_html(_pages, current_page, src=image_src)
+    if static_serving():
+        # Let the browser fetch the next spread while the reader looks at this one
+        for path in spread_image_paths(_pages, current_page + 2):
+            href = image_src(path)
+            if href:
+                html += f'<link rel="prefetch" href="{escape(href)}" as="image">'
+    return html
 
-def build_pages(data: dict):
-    pages = []
-    pages.append({"kind":"cover", "image": data.get("storybook_image_path"), "title": data.get("storybook_title", "")})
-    for pg in data.get("pages", []):
-        pages.append({"kind":"image", "image": pg.get("scene_image_path"), "n": pg.get("page_number")})
-        pages.append({"kind":"text",  "text": pg.get("scene_text",""), "n": pg.get("page_number")})
-    return pages
-
-def image_page_html(img_path: str, cover=False):
-    uri = to_data_uri(img_path)
-    if uri is None:
-        body = f'<div style="display:flex;height:100%;align-items:center;justify-content:center;opacity:.7;padding:24px;text-align:center;">Immagine non trovata<br><small>{escape(str(img_path) or "")}</small></div>'
-    else:
-        body = f'<img src="{uri}" alt="">'
-    if cover:
-        return f'<div class="page cover">{body}</div>'
-    else:
-        return f'<div class="page image">{body}</div>'
-
-def text_page_html(text: str, page_num: int):
-    safe = escape(text or "").replace("\n\n", "</p><p>").replace("\n", "<br>")
-    return f'<div class="page text"><div class="content"><p>{safe}</p></div><div class="num">{page_num}</div></div>'
-
-def page_to_html(pobj, idx):
-    if pobj["kind"] in {"cover","image"}:
-        return image_page_html(pobj.get("image"), cover=(pobj["kind"]=="cover"))
-    else:
-        return text_page_html(pobj.get("text",""), idx)
-    
 def render_spread(pages, current_page: int):
-    total = len(pages)
-    if current_page == 1:
-        html = image_page_html(pages[0].get("image"), cover=True)
-        st.markdown(html, unsafe_allow_html=True)
-        return
-
-    left_idx  = current_page if current_page % 2 == 0 else current_page - 1
-    right_idx = left_idx + 1 if left_idx + 1 <= total else None
-
-    left_html  = page_to_html(pages[left_idx - 1],  left_idx)
-    right_html = page_to_html(pages[right_idx - 1], int(left_idx/2)) if right_idx else ""
-
-    spread = f'<div class="flip">{left_html}{right_html}</div>'
-    st.markdown(spread, unsafe_allow_html=True)
-
-def generate_storybook(payload: dict) -> dict:
-    output = TaleWeaver().crew().kickoff(inputs=payload)
-    json_data = output.to_dict()
-    
-    with open(os.path.join(os.getenv("OUTPUT_DIR", "./"), "".join([json_data.get("storybook_title", "storybook"),".json"])), "w", encoding="utf-8") as f:
-        json.dump(json_data, f, ensure_ascii=False, indent=2)
-    pdf.generate_storybook_pdf(json_data, os.path.join(os.getenv("OUTPUT_DIR", "./"), "".join([json_data.get("storybook_title", "storybook"),".pdf"])))
+    st.markdown(cached_spread_html(st.session_state.book_key, current_page, pages), unsafe_allow_html=True)
+    display_assets().prefetch(spread_image_paths(pages, current_page + 2))
+
+def open_book(res: dict):
+    """Load a storybook into the flipbook, preparing its display images once."""
+    display_assets().build_book(res)
+    st.session_state.api_result = res
+    st.session_state.book_key = hashlib.sha1(json.dumps(res, sort_keys=True).encode("utf-8")).hexdigest()
+    st.session_state.pages = build_pages(res)
+    st.session_state.total_pages = len(st.session_state.pages)
+    st.session_state.page = 1
+
+@st.cache_resource(show_spinner=False)
+def storybook_library(outdir: str) -> StorybookLibrary:
+    """Library index of `outdir`, synced with its JSON files once per server process."""
+    library = get_library(outdir)
+    library.sync(outdir)
+    return library
+
+def book_label(book: dict) -> str:
+    created = datetime.fromtimestamp(book["created"]).strftime("%Y-%m-%d %H:%M")
+    language = f"{book['language']}, " if book["language"] else ""
+    return f"{book['title']} ({language}{book['page_count']} pages, {created})"
+
+def generate_storybook_progressively(payload: dict) -> dict:
+    """Generate the storybook showing each illustration as soon as it is ready."""
+    from tale_weaver.streaming import generate_storybook_events
+
+    progress = st.progress(0.0, text="Writing the story…")
+    preview = st.empty()
+    json_data = None
+    for event in generate_storybook_events(payload):
+        book = event.storybook
+        if event.kind == "story":
+            progress.progress(0.0, text=f"“{book.storybook_title}” is written, illustrating…")
+        elif event.kind in {"character", "page", "cover"}:
+            label = {"character": f"Character {event.character_name}",
+                     "page": f"Page {event.page_number}",
+                     "cover": "Cover"}[event.kind]
+            progress.progress(min(1.0, event.completed / max(1, event.total)),
+                              text=f"{label} {'redrawn' if event.replaced else 'ready'} "
+                                   f"({event.completed}/{event.total})")
+            if event.kind == "page":
+                page = next(p for p in book.pages if p.page_number == event.page_number)
+                with preview.container():
+                    st.markdown(f'<div class="flip">{image_page_html(page.scene_image_path, src=image_src)}'
+                                f'{text_page_html(page.scene_text, page.page_number)}</div>',
+                                unsafe_allow_html=True)
+        elif event.kind == "pdf":
+            progress.progress(1.0, text="Storybook ready!")
+            json_data = book.model_dump()
     return json_data
 
+def service_call(path: str, payload: dict = None) -> dict:
+    """GET (or POST `payload` as JSON) on the generation service."""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(f"{SERVICE_URL}{path}", data=data, method="POST" if data is not None else "GET",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+def follow_job(job_id: str) -> dict:
+    """Poll a service job, showing its progress and latest page, until it is done."""
+    progress = st.progress(0.0, text="Waiting for the storyteller…")
+    if st.button("Cancel", key="cancel-job"):
+        service_call(f"/jobs/{job_id}/cancel", {})
+    preview = st.empty()
+    shown = None
+    while True:
+        job = service_call(f"/jobs/{job_id}/partial")
+        book = job["storybook"]
+        if job["status"] == "done":
+            progress.progress(1.0, text="Storybook ready!")
+            return StorybookLibrary.load(job["json_path"])
+        if job["status"] in {"failed", "cancelled"}:
+            raise RuntimeError(job["error"] or f"the job was {job['status']}")
+        if job["status"] == "queued":
+            progress.progress(0.0, text="Waiting for a free worker…")
+        elif job["completed"]:
+            progress.progress(min(1.0, job["completed"] / max(1, job["total"])),
+                              text=f"“{job['title']}”: {job['completed']}/{job['total']} illustrations ready")
+        elif job["title"]:
+            progress.progress(0.0, text=f"“{job['title']}” is being written, illustrating…")
+        illustrated = [p for p in (book or {}).get("pages", []) if p.get("scene_image_path")]
+        if illustrated and illustrated[-1]["page_number"] != shown:
+            page = illustrated[-1]
+            shown = page["page_number"]
+            with preview.container():
+                st.markdown(f'<div class="flip">{image_page_html(page["scene_image_path"], src=image_src)}'
+                            f'{text_page_html(page["scene_text"], page["page_number"])}</div>',
+                            unsafe_allow_html=True)
+        time.sleep(SERVICE_POLL_SECONDS)
+
 # ---------- STATE ----------
 if "page" not in st.session_state:
     st.session_state.page = 1
@@ -171,6 +237,10 @@ if "pages" not in st.session_state:
     st.session_state.pages = []
 if "total_pages" not in st.session_state:
     st.session_state.total_pages = 0
+if "book_key" not in st.session_state:
+    st.session_state.book_key = ""
+if "job_id" not in st.session_state:
+    st.session_state.job_id = st.query_params.get("job") if SERVICE_URL else None
 
 # ---------- FORM CREATE STORYBOOK ----------
 if not st.session_state.submitted:
@@ -189,36 +259,65 @@ if not st.session_state.submitted:
             "pageCount": int(page_count_input),
             "penultimatePage": int(page_count_input-1)
         }
+        if SERVICE_URL:
+            try:
+                job = service_call("/jobs", {k: payload[k] for k in ("topic", "language", "pageCount")})
+            except Exception as e:
+                st.error(f"An error occurs during call: {e}")
+                st.stop()
+            st.session_state.job_id = job["id"]
+            st.query_params["job"] = job["id"]
+        else:
+            try:
+                res = generate_storybook_progressively(payload)
+            except Exception as e:
+                st.error(f"An error occurs during call: {e}")
+                st.stop()
+
+            open_book(res)
+            st.session_state.form_text = topic
+            st.session_state.form_mode = language
+            st.session_state.submitted = True
+            st.rerun()  
+
+    if st.session_state.job_id:
+        job_id = st.session_state.job_id
         try:
-            with st.spinner("Generating Storybook…"):
-                res = generate_storybook(payload)
+            res = follow_job(job_id)
         except Exception as e:
             st.error(f"An error occurs during call: {e}")
-            st.stop()
-
-        st.session_state.api_result = res
-        st.session_state.pages = build_pages(res)
-        st.session_state.total_pages = len(st.session_state.pages)
-
-        st.session_state.form_text = topic
-        st.session_state.form_mode = language
-        st.session_state.page = 1
-        st.session_state.submitted = True
-        st.rerun()  
+            res = None
+        st.session_state.job_id = None
+        st.query_params.pop("job", None)
+        if res is not None:
+            open_book(res)
+            st.session_state.submitted = True
+            st.rerun()
 
     # --- FORM OPEN EXISTING STORYBOOK ---
     outdir = os.getenv("OUTPUT_DIR", "./")
-    json_list = sorted([p.name.replace(".json", "") for p in Path(outdir).glob("*.json")])
+    library = storybook_library(outdir)
+
+    st.subheader("See an existing Storybook")
+    query = st.text_input("Search by title or language", key="library_query",
+                          on_change=lambda: st.session_state.update(library_page=1))
+    book_count = library.count(query)
+    library_pages = max(1, math.ceil(book_count / LIBRARY_PAGE_SIZE))
+    library_page = 1
+    if library_pages > 1:
+        library_page = st.number_input(f"Page (of {library_pages})", min_value=1, max_value=library_pages,
+                                       value=1, key="library_page")
+    books = library.search(query, limit=LIBRARY_PAGE_SIZE, offset=(library_page - 1) * LIBRARY_PAGE_SIZE)
+    thumbnails = [b for b in books if b["thumbnail_path"] and os.path.exists(b["thumbnail_path"])]
+    if thumbnails:
+        st.image([b["thumbnail_path"] for b in thumbnails], caption=[b["title"] for b in thumbnails], width=80)
 
     with st.form("open_existing"):
-        st.subheader("See an existing Storybook")
-        if not json_list:
-            st.info("No Storybook has been created yet.")
-            open_clicked = False
-            selected_json = None
-            dl_clicked = False
+        if not books:
+            st.info("No Storybook found." if query else "No Storybook has been created yet.")
+            selected_book = None
         else:
-            selected_json = st.selectbox("Select a Storybook:", options=json_list, index=0)
+            selected_book = st.selectbox("Select a Storybook:", options=books, format_func=book_label, index=0)
         c_open, c_dl, sp_l, sp_r = st.columns([2, 2, 3, 5])
         with c_open:
             open_clicked = st.form_submit_button("Open Storybook")
@@ -227,8 +326,8 @@ if not st.session_state.submitted:
             
                 
     # Download selected Storybook
-    if dl_clicked and selected_json:
-        pdf_path = (Path(outdir) / selected_json).with_suffix(".pdf")
+    if dl_clicked and selected_book:
+        pdf_path = Path(selected_book["pdf_path"] or Path(selected_book["json_path"]).with_suffix(".pdf"))
         if pdf_path.exists():
             with open(pdf_path, "rb") as f:
                 st.download_button(
@@ -239,20 +338,16 @@ if not st.session_state.submitted:
                     use_container_width=True,
                 )
         else:
-            st.warning(f"PDF not found: {selected_json.replace('.json', '.pdf')}")
+            st.warning(f"PDF not found: {pdf_path.name}")
     # Open selected Storybook
-    if open_clicked and selected_json:
+    if open_clicked and selected_book:
         try:
-            with open(Path(outdir) / "".join([selected_json, ".json"]), "r", encoding="utf-8") as f:
-                res = json.load(f)
+            res = library.load(selected_book["json_path"])
         except Exception as e:
             st.error(f"An error occurs loading the JSON file: {e}")
             st.stop()
 
-        st.session_state.api_result = res
-        st.session_state.pages = build_pages(res)
-        st.session_state.total_pages = len(st.session_state.pages)
-        st.session_state.page = 1
+        open_book(res)
         st.session_state.submitted = True
         st.rerun()
 
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from tale_weaver.model.storybook import Storybook
+from tale_weaver.streaming import generate_storybook_events
+from tale_weaver.tools.custom_tool import IllustrationTool
+from tale_weaver.utils.manifest import IllustrationManifest, manifest_path_for
+from tale_weaver.utils.manifest import book_id as safe_book_id
+from tale_weaver.utils.storybook_io import save_storybook
+
+
+def load_batch_inputs(inputs_path: str) -> List[dict]:
+    """
+    Read one crew input per JSONL line: {"topic": ..., "language": ..., "pageCount": ...}.
+
+    `language` defaults to English and `pageCount` to 10; `penultimatePage` is derived.
+    Each input gets an `id` (explicit, or a hash of its content) used to resume the batch.
+    """
+    inputs = []
+    with open(inputs_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if not item.get("topic"):
+                raise ValueError(f"{inputs_path}:{line_number}: missing 'topic'")
+            page_count = int(item.get("pageCount", 10))
+            payload = {
+                "topic": item["topic"],
+                "language": item.get("language", "English"),
+                "pageCount": page_count,
+                "penultimatePage": page_count - 1,
+            }
+            book_id = item.get("id") or hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+            inputs.append({"id": str(book_id), "inputs": payload})
+    return inputs
+
+
+class BatchStatus:
+    """
+    Per-book status of a batch, persisted as JSON after every change so an
+    interrupted batch can be resumed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.books: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.books = json.load(f)
+
+    def is_done(self, book_id: str) -> bool:
+        return self.books.get(book_id, {}).get("status") == "done"
+
+    def update(self, book_id: str, **fields) -> None:
+        with self._lock:
+            self.books.setdefault(book_id, {}).update(fields)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.books, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def _illustrate_missing(manifest_path: str, output_dir: str,
+                        language: Optional[str]) -> Tuple[str, str, IllustrationManifest]:
+    """Generate the images a book's manifest records as failed, then rewrite its JSON and PDF."""
+    manifest = IllustrationManifest(manifest_path)
+    storybook = Storybook(**manifest.storybook)
+    IllustrationTool().illustrate(storybook, manifest=manifest, incremental=True)
+    _, pdf_path = save_storybook(storybook.model_dump(), output_dir, language=language, book_key=manifest.book_key)
+    return pdf_path, storybook.storybook_title, manifest
+
+
+def run_batch(inputs_path: str, concurrency: int = 2, output_dir: Optional[str] = None,
+              status_path: Optional[str] = None) -> BatchStatus:
+    """
+    Generate every storybook listed in a JSONL file, running up to `concurrency` crews at once.
+
+    Each book's JSON and PDF are written to `output_dir` (default `OUTPUT_DIR`), named after
+    its batch id, as are its manifest and image directory: books with the same title do not
+    overwrite each other. Books already marked "done" in the status file are skipped, so
+    re-running the same command resumes an interrupted batch; failed books are retried.
+    A book exported with images missing (their generation failed) is marked "incomplete"
+    with the missing asset keys; the next run generates only those from its manifest.
+
+    Args:
+        inputs_path: JSONL file of crew inputs (see `load_batch_inputs`).
+        concurrency: Maximum number of crews running at the same time.
+        output_dir: Destination of the generated books.
+        status_path: Status file; defaults to `<output_dir>/<inputs name>.status.json`.
+
+    Returns:
+        BatchStatus: Final per-book status, timings and output paths.
+    """
+    output_dir = output_dir or os.getenv("OUTPUT_DIR", "./")
+    os.makedirs(output_dir, exist_ok=True)
+    status_path = status_path or os.path.join(
+        output_dir, f"{os.path.splitext(os.path.basename(inputs_path))[0]}.status.json")
+    status = BatchStatus(status_path)
+
+    pending = [item for item in load_batch_inputs(inputs_path) if not status.is_done(item["id"])]
+    incomplete = {book_id: entry["manifest_path"] for book_id, entry in status.books.items()
+                  if entry.get("status") == "incomplete" and os.path.exists(entry.get("manifest_path") or "")}
+    for item in pending:
+        status.update(item["id"], status="pending", inputs=item["inputs"])
+    print(f"Batch: {len(pending)} storybooks to generate, {len(status.books) - len(pending)} already done")
+
+    def generate(item: dict) -> None:
+        book_id = item["id"]
+        start = time.time()
+        status.update(book_id, status="running", started=start, error=None)
+        try:
+            if book_id in incomplete:
+                pdf_path, title, manifest = _illustrate_missing(incomplete[book_id], output_dir,
+                                                                item["inputs"].get("language"))
+            else:
+                book_key = safe_book_id(book_id)
+                pdf_path, storybook = None, None
+                for event in generate_storybook_events(item["inputs"], output_dir, book_key=book_key):
+                    if event.kind == "pdf":
+                        pdf_path, storybook = event.path, event.storybook
+                if pdf_path is None:
+                    raise RuntimeError("generation ended without a PDF")
+                title = storybook.storybook_title
+                # Failed images are only recorded in the manifest: the PDF is exported without them
+                manifest = IllustrationManifest(manifest_path_for(storybook, book_key=book_key))
+            json_path = os.path.splitext(pdf_path)[0] + ".json"
+        except Exception as e:
+            status.update(book_id, status="failed", error=str(e), seconds=time.time() - start)
+            print(f"Batch: storybook {book_id} failed: {e}")
+            return
+        missing = sorted(manifest.failures)
+        status.update(book_id, status="incomplete" if missing else "done", title=title, missing=missing,
+                      manifest_path=os.path.abspath(manifest.path),
+                      json_path=os.path.abspath(json_path), pdf_path=os.path.abspath(pdf_path),
+                      seconds=time.time() - start)
+        if missing:
+            print(f"Batch: storybook {book_id} exported with {len(missing)} images missing: {', '.join(missing)}")
+        else:
+            print(f"Batch: storybook {book_id} done in {time.time() - start:.1f}s")
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="tale-weaver-batch") as executor:
+        list(executor.map(generate, pending))
+    return status
@@ -1,16 +1,44 @@
 from crewai import Agent, Crew, LLM, Process, Task
-from crewai.project import CrewBase, agent, crew, task
+from crewai.project import CrewBase, agent, before_kickoff, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
+from crewai.tasks.task_output import TaskOutput
 from tale_weaver.model.storybook import Storybook
 from tale_weaver.tools.custom_tool import IllustrationTool
-from typing import List
+from tale_weaver.utils import tracing
+from tale_weaver.utils.env import load_env
+from tale_weaver.utils.llm_cache import CachedLLM, llm_cache_enabled
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional
 import os
+import threading
+import time
 # If you want to run a snippet of code before or after the crew starts,
 # you can use the @before_kickoff and @after_kickoff decorators
 # https://docs.crewai.com/concepts/crews#example-crew-class-with-decorators
 
-creative_model = LLM(os.getenv("CREATIVE_MODEL", "gemini/gemini-2.5-flash"), temperature=0.9, seed=23)
-tool_model = LLM(os.getenv("TOOL_MODEL", "openai/gpt-4o"), temperature=0.2, seed=23)
+def _llm(model: str, cacheable: bool = True, **kwargs) -> LLM:
+    # LLM_CACHE=1 answers repeated identical requests (train/test loops, same inputs) from disk
+    return CachedLLM(model, **kwargs) if cacheable and llm_cache_enabled() else LLM(model, **kwargs)
+
+def creative_llm(stream: bool = False) -> LLM:
+    """Storyteller model; `stream=True` makes it emit LLMStreamChunkEvent while it writes."""
+    load_env()
+    return _llm(os.getenv("CREATIVE_MODEL", "gemini/gemini-2.5-flash"), temperature=0.9, seed=23, stream=stream)
+
+# Built on first use rather than at import, then shared by every crew of the process
+@lru_cache(maxsize=1)
+def creative_model() -> LLM:
+    return creative_llm()
+
+# Never cached: the illustrator is a ReAct agent whose tools are described in the prompt, so
+# a replayed turn could carry a stale tool Observation instead of running the tool
+@lru_cache(maxsize=1)
+def tool_model() -> LLM:
+    load_env()
+    return _llm(os.getenv("TOOL_MODEL", "openai/gpt-4o"), cacheable=False, temperature=0.2, seed=23)
+
+_kickoff_started: ContextVar[Optional[float]] = ContextVar("tale_weaver_kickoff_started", default=None)
 
 @CrewBase
 class TaleWeaver():
@@ -29,7 +57,7 @@ class TaleWeaver():
     def storyteller(self) -> Agent:
         return Agent(
             config=self.agents_config['storyteller'], # type: ignore[index]
-            llm=creative_model
+            llm=creative_model()
         )
 
     @agent
@@ -37,17 +65,32 @@ class TaleWeaver():
         return Agent(
             config=self.agents_config['illustrator'], # type: ignore[index]
             tools=[IllustrationTool()],
-            llm=tool_model
+            llm=tool_model()
         )
 
     # To learn more about structured task outputs,
     # task dependencies, and task callbacks, check out the documentation:
     # https://docs.crewai.com/concepts/tasks#overview-of-a-task
+    # The start time lives in a context variable, not on the instance: crews copied from
+    # a shared template (see CrewFactory) can run concurrently
+    @before_kickoff
+    def trace_kickoff(self, inputs):
+        _kickoff_started.set(time.time())
+        return inputs
+
+    def trace_story(self, output: TaskOutput):
+        started = _kickoff_started.get()
+        if started is not None:
+            book = (output.json_dict or {}).get("storybook_title", "")
+            tracing.record_span("create_story", started, time.time() - started,
+                                book=book, bytes=len((output.raw or "").encode("utf-8")))
+
     @task
     def create_story(self) -> Task:
         return Task(
             config=self.tasks_config['create_story'], # type: ignore[index]
-            output_json=Storybook
+            output_json=Storybook,
+            callback=self.trace_story
         )
 
     @task
@@ -71,3 +114,62 @@ class TaleWeaver():
             output_log_file="logs.json",
             # process=Process.hierarchical, # In case you wanna use that instead https://docs.crewai.com/how-to/Hierarchical/
         )
+
+    def story_crew(self, llm: Optional[LLM] = None) -> Crew:
+        """
+        Creates a crew running only the storyteller, so illustrations can be driven separately.
+        A dedicated `llm` (e.g. a streaming one) replaces the shared storyteller model.
+        """
+        storyteller = self.storyteller()
+        story = self.create_story()
+        if llm is not None:
+            storyteller = Agent(config=self.agents_config['storyteller'], llm=llm) # type: ignore[index]
+            story.agent = storyteller
+        return Crew(
+            agents=[storyteller],
+            tasks=[story],
+            process=Process.sequential,
+            before_kickoff_callbacks=[self.trace_kickoff],
+            verbose=True,
+            output_log_file="logs.json",
+        )
+
+
+class CrewFactory:
+    """
+    Hands out ready-to-run crews copied from templates built once per process.
+
+    Building a crew through `TaleWeaver()` parses the agents and tasks YAML, interpolates
+    the configuration and constructs every agent, tool and task. The factory does this
+    once per kind of crew and returns `Crew.copy()` of the template afterwards, so each
+    request only pays for its own agents and tasks state. Copies share the LLM clients
+    and the (stateless) illustration tool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates: Dict[str, Crew] = {}
+
+    def _template(self, kind: str) -> Crew:
+        with self._lock:
+            if kind not in self._templates:
+                weaver = TaleWeaver()
+                self._templates[kind] = weaver.crew() if kind == "crew" else weaver.story_crew()
+            return self._templates[kind]
+
+    def crew(self) -> Crew:
+        """A fresh copy of the full storyteller + illustrator crew."""
+        return self._template("crew").copy()
+
+    def story_crew(self, llm: Optional[LLM] = None) -> Crew:
+        """A fresh copy of the storyteller-only crew, optionally running on a dedicated `llm`."""
+        crew = self._template("story").copy()
+        if llm is not None:
+            crew.agents[0].llm = llm
+        return crew
+
+
+@lru_cache(maxsize=1)
+def get_crew_factory() -> CrewFactory:
+    """The crew factory shared by the whole process."""
+    return CrewFactory()
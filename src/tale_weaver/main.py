@@ -1,13 +1,31 @@
 #!/usr/bin/env python
+import json
+import os
 import sys
+import time
 import warnings
 
 from datetime import datetime
 
+from tale_weaver.batch import run_batch
 from tale_weaver.crew import TaleWeaver
+from tale_weaver.tools.custom_tool import IllustrationTool
+from tale_weaver.model.storybook import Storybook
+from tale_weaver.tools.image_backend import LocalImageBackend
+from tale_weaver.utils.asset_store import AssetStore
+from tale_weaver.utils.env import load_env
+from tale_weaver.utils.image_cache import get_image_cache, image_cache_enabled
+from tale_weaver.utils.image_output import get_image_writer
+from tale_weaver.utils.llm_cache import report_llm_cache
+from tale_weaver.utils.manifest import IllustrationManifest
+from tale_weaver.utils.rate_limiter import get_image_rate_limiter
+from tale_weaver.utils.storybook_io import save_storybook
+from tale_weaver.utils.synthetic import synthetic_storybook
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
+load_env()
+
 # This main file is intended to be a way for you to run your
 # crew locally, so refrain from adding unnecessary logic into this file.
 # Replace with inputs you want to test with, it will automatically
@@ -28,6 +46,7 @@ def run():
         TaleWeaver().crew().kickoff(inputs=inputs)
     except Exception as e:
         raise Exception(f"An error occurred while running the crew: {e}")
+    report_llm_cache()
 
 
 def train():
@@ -45,6 +64,7 @@ def train():
 
     except Exception as e:
         raise Exception(f"An error occurred while training the crew: {e}")
+    report_llm_cache()
 
 def replay():
     """
@@ -55,6 +75,7 @@ def replay():
 
     except Exception as e:
         raise Exception(f"An error occurred while replaying the crew: {e}")
+    report_llm_cache()
 
 def test():
     """
@@ -72,6 +93,123 @@ def test():
 
     except Exception as e:
         raise Exception(f"An error occurred while testing the crew: {e}")
+    report_llm_cache()
+
+def batch():
+    """
+    Generate many storybooks from a JSONL file of inputs, several crews at a time.
+    Usage: batch <inputs.jsonl> [concurrency]
+    """
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else int(os.getenv("BATCH_CONCURRENCY", "2"))
+    try:
+        status = run_batch(sys.argv[1], concurrency=concurrency)
+    except Exception as e:
+        raise Exception(f"An error occurred while running the batch: {e}")
+
+    report_llm_cache()
+    failed = [book_id for book_id, book in status.books.items() if book.get("status") != "done"]
+    print(f"Batch finished: {len(status.books) - len(failed)} done, {len(failed)} failed. Status: {status.path}")
+    if failed:
+        sys.exit(1)
+
+def loadtest():
+    """
+    Illustrate a synthetic storybook with the offline image backend and report throughput.
+    Usage: loadtest [pages] [characters] [workers]
+    """
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    character_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else int(os.getenv("ILLUSTRATION_WORKERS", "4"))
+
+    # The offline backend has no quota: calls are only throttled when a rate is set explicitly
+    os.environ.setdefault("IMAGE_REQUESTS_PER_MIN", "0")
+    backend = LocalImageBackend.from_env()
+    storybook = synthetic_storybook(page_count, character_count)
+    images = len(storybook.characters) + len(storybook.pages) + 1
+
+    start = time.perf_counter()
+    IllustrationTool(backend=backend, max_workers=workers).illustrate(storybook)
+    elapsed = time.perf_counter() - start
+
+    stats = backend.stats()
+    print(f"{images} images with {workers} workers in {elapsed:.2f}s ({images / elapsed:.2f} images/s)")
+    print(f"Backend calls: {stats['calls']}, injected errors: {stats['errors']}")
+    if backend.reference_stats():
+        print(f"Reference images: {backend.reference_stats()}")
+    print(f"Rate limiter: {get_image_rate_limiter().stats()}")
+    print(f"Image writer: {get_image_writer().stats()}")
+    if image_cache_enabled():
+        print(f"Image cache: {get_image_cache().stats()}")
+
+def reillustrate():
+    """
+    Re-illustrate an edited storybook JSON, regenerating only the images whose prompt
+    or characters changed since the last run, then rewrite its JSON and PDF.
+    Usage: reillustrate <storybook.json> [manifest.json]
+    """
+    try:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            storybook = Storybook(**json.load(f))
+        manifest = IllustrationManifest(sys.argv[2]) if len(sys.argv) > 2 else None
+        # The JSON file name identifies the book: its manifest and images are found again from it
+        book_key = os.path.splitext(os.path.basename(sys.argv[1]))[0]
+        IllustrationTool().illustrate(storybook, manifest=manifest, incremental=True, book_key=book_key)
+        json_path, pdf_path = save_storybook(storybook.model_dump(), os.path.dirname(os.path.abspath(sys.argv[1])),
+                                             book_key=book_key)
+    except Exception as e:
+        raise Exception(f"An error occurred while re-illustrating the storybook: {e}")
+    print(f"Storybook saved to {json_path} and {pdf_path}")
+
+def resume():
+    """
+    Resume an interrupted or partially failed illustration run from its manifest,
+    generating only the missing images, then write the storybook JSON and PDF.
+    Usage: resume <OUTPUT_DIR/manifests/book.json>
+    """
+    try:
+        manifest = IllustrationManifest(sys.argv[1])
+        if not manifest.storybook:
+            raise ValueError(f"{sys.argv[1]} holds no storybook snapshot")
+        storybook = Storybook(**manifest.storybook)
+        IllustrationTool().illustrate(storybook, manifest=manifest, incremental=True)
+        output_dir = os.path.dirname(os.path.dirname(os.path.abspath(sys.argv[1])))
+        json_path, pdf_path = save_storybook(storybook.model_dump(), output_dir, book_key=manifest.book_key)
+    except Exception as e:
+        raise Exception(f"An error occurred while resuming the illustrations: {e}")
+    print(f"Storybook saved to {json_path} and {pdf_path}")
+    if manifest.failures:
+        print(f"{len(manifest.failures)} images still missing: {', '.join(sorted(manifest.failures))}")
+        sys.exit(1)
+
+def gc():
+    """
+    Delete the images no storybook or manifest of OUTPUT_DIR references anymore
+    (failed runs, regenerated books, leftover montages) and report the space freed.
+    Usage: gc [--dry-run]
+    """
+    dry_run = "--dry-run" in sys.argv[1:]
+    grace_seconds = float(os.getenv("GC_GRACE_MINUTES", "60")) * 60
+    try:
+        report = AssetStore().collect(dry_run=dry_run, grace_seconds=grace_seconds)
+    except Exception as e:
+        raise Exception(f"An error occurred while collecting unreferenced assets: {e}")
+    for path in report.removed:
+        print(f"{'Would remove' if dry_run else 'Removed'} {path}")
+    print(f"{'Would free' if dry_run else 'Freed'} {report.bytes_freed / (1024 * 1024):.1f} MB "
+          f"in {report.files_removed} files; kept {report.referenced} referenced and "
+          f"{report.kept_recent} recent files")
+
+def serve():
+    """
+    Run the generation service (HTTP API and job workers, see `tale_weaver.service`).
+    Usage: serve [port]
+    """
+    import uvicorn
+
+    from tale_weaver.service import create_app
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("SERVICE_PORT", "8000"))
+    uvicorn.run(create_app(), host=os.getenv("SERVICE_HOST", "127.0.0.1"), port=port)
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
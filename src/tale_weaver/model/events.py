@@ -0,0 +1,14 @@
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+from tale_weaver.model.storybook import Storybook
+
+
+class StorybookEvent(BaseModel):
+    kind: Literal["story", "character", "page", "cover", "pdf"] = Field(..., description="what has just become available.")
+    storybook: Storybook = Field(..., description="the storybook as known at the time of the event.")
+    character_name: Optional[str] = Field(None, description="the illustrated character, for 'character' events.")
+    page_number: Optional[int] = Field(None, description="the illustrated page number, for 'page' events.")
+    path: Optional[str] = Field(None, description="the file produced: image path, or PDF path for 'pdf' events.")
+    replaced: bool = Field(False, description="the illustration replaces one already reported, redrawn because the final story changed it.")
+    completed: int = Field(0, description="number of distinct illustrations completed so far.")
+    total: int = Field(0, description="number of illustrations of the storybook.")
@@ -0,0 +1,29 @@
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+from tale_weaver.model.storybook import Storybook
+
+JobState = Literal["queued", "running", "done", "failed", "cancelled"]
+
+
+class JobRequest(BaseModel):
+    topic: str = Field(..., min_length=1, description="the topic of the storybook.")
+    language: str = Field("English", description="the language the story is written in.")
+    pageCount: int = Field(10, ge=1, le=20, description="the number of pages.")
+
+
+class JobStatus(BaseModel):
+    id: str = Field(..., description="the job identifier.")
+    status: JobState = Field(..., description="the state of the job.")
+    completed: int = Field(0, description="number of illustrations completed so far.")
+    total: int = Field(0, description="number of illustrations of the storybook (estimated until the story is written).")
+    title: Optional[str] = Field(None, description="the storybook title, once known.")
+    json_path: Optional[str] = Field(None, description="the storybook JSON, once the job is done.")
+    pdf_path: Optional[str] = Field(None, description="the storybook PDF, once the job is done.")
+    error: Optional[str] = Field(None, description="why the job failed.")
+    created: float = Field(..., description="submission time (UNIX timestamp).")
+    started: Optional[float] = Field(None, description="start time (UNIX timestamp).")
+    finished: Optional[float] = Field(None, description="end time (UNIX timestamp).")
+
+
+class JobPartial(JobStatus):
+    storybook: Optional[Storybook] = Field(None, description="the storybook as generated so far.")
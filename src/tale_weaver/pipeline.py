@@ -0,0 +1,142 @@
+import threading
+from functools import partial
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from tale_weaver.model.storybook import Character, Page, Storybook
+from tale_weaver.tools.custom_tool import IllustrationTool
+from tale_weaver.utils import tracing
+from tale_weaver.utils.json_stream import IncrementalJSONParser
+from tale_weaver.utils.manifest import IllustrationManifest, manifest_path_for, plan_assets
+from tale_weaver.utils.scheduler import DependencyScheduler
+
+
+class StreamingIllustrator:
+    """
+    Illustrates a storybook while the storyteller is still writing it.
+
+    The storyteller's streamed output is fed to `feed` and parsed incrementally: each
+    character is illustrated as soon as its JSON object is complete, each scene as soon
+    as its page is (its characters always come first), and the cover once the title,
+    prompt and every character are known. `finish` then reconciles these early images
+    with the final storybook through the illustration manifest: images whose prompt
+    and characters match the final text are reused, the others are generated again.
+
+    Args:
+        tool: The illustration tool (image backend, workers).
+        on_asset: Called with (asset key, image path) once per finished image, whether
+            it was produced early or during reconciliation.
+        cancelled: Polled before each image starts (see `IllustrationTool.illustrate`).
+        book_key: Identity of the book (see `IllustrationTool.illustrate`); the early
+            images are written before the title is known, so without one they go to
+            the asset directory of the title parsed so far.
+    """
+
+    def __init__(self, tool: IllustrationTool, on_asset: Optional[Callable[[str, str], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None, book_key: Optional[str] = None):
+        self.tool = tool
+        self._cancelled = cancelled
+        self.book_key = book_key
+        self.model = tool.image_backend.model
+        self.storybook = Storybook(storybook_title="", storybook_prompt="", characters={}, pages=[])
+        self._on_asset = on_asset
+        self._parser = IncrementalJSONParser(max_depth=2)
+        self._scheduler = DependencyScheduler(max_workers=tool.max_workers, on_complete=self._completed,
+                                              isolate_failures=True)
+        self._lock = threading.Lock()
+        self._hashes: Dict[str, Tuple[str, str]] = {}
+        self._done: Dict[str, str] = {}
+        self._reported: Set[Tuple[str, str]] = set()
+        self._characters_done = False
+        self._cover_submitted = False
+        self._stopped = False
+
+    def snapshot(self) -> Storybook:
+        """Copy of the storybook parsed so far."""
+        with self._lock:
+            return self.storybook.model_copy(deep=True)
+
+    def feed(self, chunk: str) -> None:
+        """Parse a chunk of the storyteller's output and start the illustrations it completes."""
+        if self._stopped:
+            return
+        try:
+            for path, value in self._parser.feed(chunk):
+                self._handle(path, value)
+        except Exception as e:
+            # Early illustration is an optimization: finish() still illustrates everything
+            self._stopped = True
+            print(f"Streamed story could not be parsed, illustrating once it is complete: {e}")
+
+    def _handle(self, path: tuple, value) -> None:
+        if path == ("storybook_title",):
+            self.storybook.storybook_title = value
+        elif path == ("storybook_prompt",):
+            self.storybook.storybook_prompt = value
+        elif path == ("characters",):
+            self._characters_done = True
+        elif len(path) == 2 and path[0] == "characters":
+            name, character = path[1], Character(**value)
+            with self._lock:
+                self.storybook.characters[name] = character
+            self._submit(f"character:{name}", partial(self.tool._illustrate_character, name, character))
+        elif len(path) == 2 and path[0] == "pages":
+            page = Page(**value)
+            with self._lock:
+                self.storybook.pages.append(page)
+                page_number = len(self.storybook.pages)
+            deps = [f"character:{c}" for c in page.characters if c in self.storybook.characters]
+            self._submit(f"scene:{page_number}",
+                         partial(self.tool._illustrate_scene, self.storybook, page, page_number), deps)
+        if (self._characters_done and not self._cover_submitted and self.storybook.storybook_title
+                and self.storybook.storybook_prompt):
+            self._cover_submitted = True
+            self._submit("cover", partial(self.tool._illustrate_cover, self.storybook),
+                         [f"character:{name}" for name in self.storybook.characters])
+
+    def _submit(self, key: str, fn: Callable[[], str], deps=()) -> None:
+        with self._lock:
+            self._hashes[key] = plan_assets(self.storybook, self.model)[key]
+        book = self.storybook.storybook_title
+        self._scheduler.submit(key, partial(IllustrationTool._run_asset, book, key, fn, self._cancelled,
+                                            self.book_key),
+                               deps=deps)
+
+    def _completed(self, key: str, path: str) -> None:
+        with self._lock:
+            self._done[key] = path
+        self._report(key, path)
+
+    def _report(self, key: str, path: str) -> None:
+        with self._lock:
+            if (key, path) in self._reported:
+                return
+            self._reported.add((key, path))
+        if self._on_asset:
+            self._on_asset(key, path)
+
+    def close(self) -> None:
+        """Stop parsing and wait for the illustrations already started."""
+        self._stopped = True
+        self._scheduler.join()
+
+    def finish(self, storybook: Storybook, manifest: Optional[IllustrationManifest] = None) -> Storybook:
+        """
+        Wait for the early illustrations, then illustrate the final storybook, reusing
+        every early image whose inputs still match.
+
+        Args:
+            storybook: The storyteller's final, validated output.
+            manifest: Manifest to reconcile through; defaults to the book's one.
+
+        Returns:
+            Storybook: The final storybook with its image paths set.
+        """
+        with tracing.span("illustrate.early_join", book=storybook.storybook_title):
+            self.close()
+        manifest = manifest or IllustrationManifest(manifest_path_for(storybook, book_key=self.book_key))
+        with self._lock:
+            for key, path in self._done.items():
+                manifest.record(key, *self._hashes[key], path)
+        print(f"{len(self._done)} images were ready before the story was complete")
+        return self.tool.illustrate(storybook, on_asset=self._report, manifest=manifest, incremental=True,
+                                    cancelled=self._cancelled, book_key=self.book_key)
@@ -0,0 +1,383 @@
+"""
+Standalone generation service: an HTTP API in front of a persistent job queue.
+
+Jobs are stored in SQLite and run by a pool of worker threads, so generation no
+longer lives in the Streamlit script thread: clients submit a job, then poll its
+status and partial storybook until it is done. Jobs survive client reruns and
+disconnects. A running job holds a lease its worker pool renews; jobs whose pool
+stopped or died are queued again, so several service processes can share a queue.
+
+Endpoints:
+    POST /jobs                 submit {topic, language, pageCount} -> JobStatus
+    GET  /jobs/{id}            JobStatus
+    GET  /jobs/{id}/partial    JobPartial (status + storybook generated so far)
+    POST /jobs/{id}/cancel     JobStatus
+    GET  /health
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Set
+
+from tale_weaver.model.jobs import JobPartial, JobRequest, JobStatus
+from tale_weaver.utils.disk_cache import cache_root
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    title TEXT,
+    storybook TEXT,
+    json_path TEXT,
+    pdf_path TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created);
+"""
+
+# Columns added after the first release, for databases created before them
+_MIGRATIONS = {"worker": "ALTER TABLE jobs ADD COLUMN worker TEXT",
+               "heartbeat": "ALTER TABLE jobs ADD COLUMN heartbeat REAL"}
+
+_STATUS_FIELDS = ("id", "status", "completed", "total", "title", "json_path", "pdf_path", "error",
+                  "created", "started", "finished")
+
+
+class JobStore:
+    """
+    SQLite-backed job queue. Every method opens its own short-lived connection, so the
+    store can be shared by the API and the worker threads, and by several processes:
+    a job is claimed by one worker pool, which renews its lease (`heartbeat`) while
+    running it.
+
+    Args:
+        db_path: SQLite database file.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, statement in _MIGRATIONS.items():
+                if column not in columns:
+                    db.execute(statement)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def submit(self, request: JobRequest) -> JobStatus:
+        payload = {"topic": request.topic, "language": request.language, "pageCount": request.pageCount,
+                   "penultimatePage": request.pageCount - 1}
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs (id, status, payload, created, total) VALUES (?, 'queued', ?, ?, ?)",
+                       (job_id, json.dumps(payload), time.time(), request.pageCount + 1))
+        return self.status(job_id)
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """
+        Atomically move the oldest queued job to "running" on behalf of `worker` and
+        return it (None if the queue is empty).
+        """
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT id, payload FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    now = time.time()
+                    db.execute("UPDATE jobs SET status = 'running', started = ?, worker = ?, heartbeat = ? WHERE id = ?",
+                               (now, worker, now, row["id"]))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return {"id": row["id"], "payload": json.loads(row["payload"])} if row else None
+
+    def heartbeat(self, worker: str) -> None:
+        """Renew the lease of every job `worker` is running."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET heartbeat = ? WHERE worker = ? AND status = 'running'", (time.time(), worker))
+
+    def release(self, job_id: str, worker: str) -> bool:
+        """Queue again a job `worker` stopped running before it finished (e.g. on shutdown)."""
+        with self._connect() as db:
+            return db.execute("UPDATE jobs SET status = 'queued', started = NULL, worker = NULL, heartbeat = NULL "
+                              "WHERE id = ? AND worker = ? AND status = 'running'", (job_id, worker)).rowcount > 0
+
+    def requeue_stale(self, lease_seconds: float) -> int:
+        """Queue again the running jobs whose worker has not renewed its lease for `lease_seconds`."""
+        with self._connect() as db:
+            return db.execute("UPDATE jobs SET status = 'queued', started = NULL, worker = NULL, heartbeat = NULL "
+                              "WHERE status = 'running' AND COALESCE(heartbeat, 0) < ?",
+                              (time.time() - lease_seconds,)).rowcount
+
+    def progress(self, job_id: str, worker: str, storybook_json: str, title: str, completed: int,
+                 total: int) -> bool:
+        """Record the progress of a job `worker` is running; False if `worker` lost its lease."""
+        with self._connect() as db:
+            return db.execute("UPDATE jobs SET storybook = ?, title = ?, completed = ?, total = ? "
+                              "WHERE id = ? AND worker = ? AND status = 'running'",
+                              (storybook_json, title, completed, total, job_id, worker)).rowcount > 0
+
+    def finish(self, job_id: str, worker: str, status: str, **fields) -> bool:
+        """Record the outcome of a job `worker` is running; False if `worker` lost its lease."""
+        fields = {"status": status, "finished": time.time(), **fields}
+        with self._connect() as db:
+            return db.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} "
+                              "WHERE id = ? AND worker = ? AND status = 'running'",
+                              (*fields.values(), job_id, worker)).rowcount > 0
+
+    def cancel(self, job_id: str) -> Optional[JobStatus]:
+        """Cancel a queued job at once; ask a running job to stop. Finished jobs are left as they are."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                       (time.time(), job_id))
+            db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.status(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as db:
+            row = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def status(self, job_id: str) -> Optional[JobStatus]:
+        with self._connect() as db:
+            row = db.execute(f"SELECT {', '.join(_STATUS_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return JobStatus(**dict(row)) if row else None
+
+    def partial(self, job_id: str) -> Optional[JobPartial]:
+        with self._connect() as db:
+            row = db.execute(f"SELECT {', '.join(_STATUS_FIELDS)}, storybook FROM jobs WHERE id = ?",
+                             (job_id,)).fetchone()
+        if row is None:
+            return None
+        data = dict(row)
+        storybook = data.pop("storybook")
+        return JobPartial(**data, storybook=json.loads(storybook) if storybook else None)
+
+    def list(self, limit: int = 50) -> List[JobStatus]:
+        with self._connect() as db:
+            rows = db.execute(f"SELECT {', '.join(_STATUS_FIELDS)} FROM jobs ORDER BY created DESC LIMIT ?",
+                              (limit,)).fetchall()
+        return [JobStatus(**dict(r)) for r in rows]
+
+
+class JobWorkerPool:
+    """
+    Threads taking jobs from the store and running them with `generate_storybook_events`,
+    writing progress and the partial storybook after every event.
+
+    A cancelled job stops starting new illustrations at once; the storyteller call and
+    the images already being generated run to completion, and no PDF is exported.
+
+    The pool renews the lease of its running jobs every third of `lease_seconds` and
+    queues again the jobs whose lease expired, i.e. whose pool died. Jobs still running
+    when the pool stops are queued again as well.
+
+    Args:
+        store: The job queue.
+        workers: Number of jobs generated concurrently.
+        output_dir: Where the storybooks are written; defaults to `OUTPUT_DIR`.
+        poll_interval: Seconds between queue checks when idle.
+        lease_seconds: Time without heartbeat after which a running job is considered
+            abandoned.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, output_dir: Optional[str] = None,
+                 poll_interval: float = 1.0, lease_seconds: float = 60.0):
+        self.store = store
+        self.workers = max(1, workers)
+        self.output_dir = output_dir
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Set[str] = set()
+        self._running_lock = threading.Lock()
+
+    def start(self) -> None:
+        self._requeue_stale()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"tale-weaver-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="tale-weaver-job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _requeue_stale(self) -> None:
+        requeued = self.store.requeue_stale(self.lease_seconds)
+        if requeued:
+            print(f"Service: {requeued} abandoned jobs queued again")
+            self.notify()
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.store.heartbeat(self.worker_id)
+                self._requeue_stale()
+            except Exception as e:
+                print(f"Service: heartbeat failed: {e}")
+
+    def notify(self) -> None:
+        """Wake idle workers up, e.g. right after a submission."""
+        self._wakeup.set()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers; the jobs they were running are queued again for the next pool."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._running_lock:
+            interrupted = list(self._running)
+        for job_id in interrupted:
+            self._release(job_id)
+
+    def _release(self, job_id: str) -> None:
+        if self.store.release(job_id, self.worker_id):
+            print(f"Service: job {job_id} interrupted, queued again")
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            job = self.store.claim(self.worker_id)
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            with self._running_lock:
+                self._running.add(job["id"])
+            try:
+                self.run(job["id"], job["payload"])
+            finally:
+                with self._running_lock:
+                    self._running.discard(job["id"])
+
+    def run(self, job_id: str, payload: dict) -> None:
+        from tale_weaver.streaming import generate_storybook_events
+
+        lease_lost = threading.Event()
+
+        def cancelled() -> bool:
+            return lease_lost.is_set() or self._stop.is_set() or self.store.cancel_requested(job_id)
+
+        # Keyed by the job: jobs producing the same title do not share files, manifest or images
+        events = generate_storybook_events(payload, self.output_dir, cancelled=cancelled, book_key=job_id)
+        pdf_path = None
+        try:
+            for event in events:
+                book = event.storybook
+                if not self.store.progress(job_id, self.worker_id, book.model_dump_json(), book.storybook_title,
+                                           event.completed, event.total):
+                    # Requeued as stale (or cancelled) meanwhile: another worker may be running it now
+                    lease_lost.set()
+                if event.kind == "pdf":
+                    pdf_path = event.path
+                elif cancelled():
+                    # Skips the PDF export; the illustrations not started yet are skipped too
+                    events.close()
+                    break
+        except Exception as e:
+            if self.store.finish(job_id, self.worker_id, "failed", error=str(e)):
+                print(f"Service: job {job_id} failed: {e}")
+            return
+        if lease_lost.is_set():
+            print(f"Service: job {job_id} lost its lease, left to its new worker")
+        elif pdf_path is not None:
+            json_path = os.path.splitext(pdf_path)[0] + ".json"
+            if self.store.finish(job_id, self.worker_id, "done", json_path=json_path, pdf_path=pdf_path):
+                print(f"Service: job {job_id} done")
+        elif self.store.cancel_requested(job_id):
+            self.store.finish(job_id, self.worker_id, "cancelled")
+        elif self._stop.is_set():
+            self._release(job_id)
+        else:
+            self.store.finish(job_id, self.worker_id, "failed", error="generation ended without a PDF")
+
+
+def default_store() -> JobStore:
+    """Job store at `SERVICE_DB`, by default `<cache root>/jobs.sqlite3`."""
+    return JobStore(os.getenv("SERVICE_DB") or os.path.join(cache_root(), "jobs.sqlite3"))
+
+
+def create_app(store: Optional[JobStore] = None, pool: Optional[JobWorkerPool] = None):
+    """
+    Build the FastAPI application. The worker pool starts and stops with the app.
+
+    Args:
+        store: Job queue; defaults to `default_store()`.
+        pool: Worker pool; defaults to `SERVICE_WORKERS` workers on the store.
+    """
+    from contextlib import asynccontextmanager
+
+    from fastapi import FastAPI, HTTPException
+
+    store = store or default_store()
+    pool = pool or JobWorkerPool(store, workers=int(os.getenv("SERVICE_WORKERS", "2")),
+                                 lease_seconds=float(os.getenv("SERVICE_LEASE_SECONDS", "60")))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        pool.start()
+        yield
+        pool.stop(timeout=5)
+
+    app = FastAPI(title="Tale Weaver", lifespan=lifespan)
+
+    def found(job):
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    @app.get("/health")
+    def health() -> dict:
+        return {"status": "ok", "workers": pool.workers}
+
+    @app.post("/jobs", response_model=JobStatus, status_code=202)
+    def submit(request: JobRequest) -> JobStatus:
+        job = store.submit(request)
+        pool.notify()
+        return job
+
+    @app.get("/jobs", response_model=List[JobStatus])
+    def jobs(limit: int = 50) -> List[JobStatus]:
+        return store.list(limit)
+
+    @app.get("/jobs/{job_id}", response_model=JobStatus)
+    def status(job_id: str) -> JobStatus:
+        return found(store.status(job_id))
+
+    @app.get("/jobs/{job_id}/partial", response_model=JobPartial)
+    def partial(job_id: str) -> JobPartial:
+        return found(store.partial(job_id))
+
+    @app.post("/jobs/{job_id}/cancel", response_model=JobStatus)
+    def cancel(job_id: str) -> JobStatus:
+        return found(store.cancel(job_id))
+
+    return app
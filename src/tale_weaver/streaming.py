@@ -0,0 +1,180 @@
+import asyncio
+import queue
+import threading
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from tale_weaver.crew import creative_llm, get_crew_factory
+from tale_weaver.model.events import StorybookEvent
+from tale_weaver.model.storybook import Storybook
+from tale_weaver.pipeline import StreamingIllustrator
+from tale_weaver.tools.custom_tool import IllustrationTool
+from tale_weaver.utils.disk_cache import env_flag
+from tale_weaver.utils.llm_stream import stream_chunks
+from tale_weaver.utils.storybook_io import save_storybook
+
+_DONE = object()
+
+
+def generate_storybook_events(payload: dict, output_dir: Optional[str] = None, overlap: Optional[bool] = None,
+                              cancelled: Optional[Callable[[], bool]] = None,
+                              book_key: Optional[str] = None) -> Iterator[StorybookEvent]:
+    """
+    Generate a storybook progressively, yielding an event as each part becomes available.
+
+    The storyteller runs first ("story" event, no image yet); then the illustrations are
+    generated concurrently and reported as they are saved ("character", "page" and
+    "cover" events, in completion order); finally the JSON and PDF are written ("pdf"
+    event, whose storybook is the final one).
+
+    With `overlap` (default: `STORY_PIPELINE_OVERLAP`), the storyteller's output is
+    streamed and illustration starts while the story is still being written, so image
+    events may precede the "story" event and carry the part of the storybook parsed
+    so far; their `total` is an estimate until the story is complete.
+
+    Args:
+        payload: Crew inputs (topic, language, pageCount, penultimatePage).
+        output_dir: Where the JSON and PDF are written; defaults to `OUTPUT_DIR`.
+        overlap: Illustrate while the story is being written.
+        cancelled: Polled before each illustration starts; once it returns True the
+            remaining illustrations are skipped and nothing is exported. Closing the
+            iterator early has the same effect.
+        book_key: Identity of the book (a batch item or job id), naming its JSON, PDF,
+            manifest and asset directory; defaults to the title.
+
+    Yields:
+        StorybookEvent: Progress events, each carrying a snapshot of the storybook.
+    """
+    overlap = env_flag("STORY_PIPELINE_OVERLAP") if overlap is None else overlap
+    closed = threading.Event()
+    user_cancelled = cancelled
+
+    def cancelled() -> bool:
+        return closed.is_set() or (user_cancelled is not None and user_cancelled())
+
+    events: "queue.Queue" = queue.Queue()
+    lock = threading.Lock()
+    state = {"snapshot": None, "error": None, "storybook": None}
+    # Assets reported so far: an image redrawn during reconciliation replaces its early version
+    done = set()
+
+    def total_of(storybook: Storybook) -> int:
+        pages = max(len(storybook.pages), int(payload.get("pageCount") or 0) if overlap else 0)
+        return len(storybook.characters) + pages + 1
+
+    def on_asset(key: str, path: str):
+        # Snapshot under the lock: workers keep filling the storybook concurrently
+        with lock:
+            replaced = key in done
+            done.add(key)
+            snapshot = state["snapshot"]()
+            count = len(done)
+        total = max(count, total_of(snapshot))
+        kind, _, ref = key.partition(":")
+        if kind == "character":
+            events.put(StorybookEvent(kind="character", storybook=snapshot, character_name=ref, path=path,
+                                      replaced=replaced, completed=count, total=total))
+        elif kind == "scene":
+            page = snapshot.pages[int(ref) - 1]
+            events.put(StorybookEvent(kind="page", storybook=snapshot, page_number=page.page_number, path=path,
+                                      replaced=replaced, completed=count, total=total))
+        else:
+            events.put(StorybookEvent(kind="cover", storybook=snapshot, path=path,
+                                      replaced=replaced, completed=count, total=total))
+
+    def story_ready(storybook: Storybook):
+        with lock:
+            state["storybook"] = storybook
+            state["snapshot"] = lambda: storybook.model_copy(deep=True)
+            count = len(done)
+        events.put(StorybookEvent(kind="story", storybook=storybook.model_copy(deep=True),
+                                  completed=count, total=total_of(storybook)))
+
+    def produce():
+        try:
+            if overlap:
+                llm = creative_llm(stream=True)
+                illustrator = StreamingIllustrator(IllustrationTool(), on_asset=on_asset, cancelled=cancelled,
+                                                   book_key=book_key)
+                state["snapshot"] = illustrator.snapshot
+                try:
+                    with stream_chunks(llm, illustrator.feed):
+                        output = get_crew_factory().story_crew(llm=llm).kickoff(inputs=payload)
+                    storybook = Storybook(**output.to_dict())
+                except BaseException:
+                    illustrator.close()
+                    raise
+                story_ready(storybook)
+                illustrator.finish(storybook)
+            else:
+                output = get_crew_factory().story_crew().kickoff(inputs=payload)
+                storybook = Storybook(**output.to_dict())
+                story_ready(storybook)
+                IllustrationTool().illustrate(storybook, on_asset=on_asset, cancelled=cancelled, book_key=book_key)
+        except BaseException as e:
+            state["error"] = e
+        finally:
+            events.put(_DONE)
+
+    threading.Thread(target=produce, name="tale-weaver-illustrate", daemon=True).start()
+    try:
+        while True:
+            event = events.get()
+            if event is _DONE:
+                break
+            yield event
+    except GeneratorExit:
+        # The consumer stopped listening: stop the illustrations not started yet
+        closed.set()
+        raise
+    if state["error"] is not None:
+        raise state["error"]
+    if cancelled():
+        return
+
+    storybook = state["storybook"]
+    json_data = storybook.model_dump()
+    _, pdf_path = save_storybook(json_data, output_dir, language=payload.get("language"), book_key=book_key)
+    # Early images of pages the final story dropped are not part of the book
+    final_keys = ({f"character:{name}" for name in storybook.characters} | {"cover"}
+                  | {f"scene:{n}" for n in range(1, len(storybook.pages) + 1)})
+    yield StorybookEvent(kind="pdf", storybook=storybook, path=pdf_path, completed=len(done & final_keys),
+                         total=len(final_keys))
+
+
+async def agenerate_storybook_events(payload: dict, output_dir: Optional[str] = None, overlap: Optional[bool] = None,
+                                     cancelled: Optional[Callable[[], bool]] = None,
+                                     book_key: Optional[str] = None) -> AsyncIterator[StorybookEvent]:
+    """
+    Async-iterator version of `generate_storybook_events`, taking the same arguments; the
+    blocking work runs in the default executor so the event loop is never stalled.
+    Leaving the iteration early (or cancelling the consuming task) closes the generator,
+    which skips the illustrations not started yet.
+    """
+    loop = asyncio.get_running_loop()
+    events = generate_storybook_events(payload, output_dir, overlap=overlap, cancelled=cancelled, book_key=book_key)
+    # Serializes `next` and `close`: a generator cannot be closed while it runs in the executor
+    running = threading.Lock()
+
+    def step():
+        with running:
+            return next(events, _DONE)
+
+    def close():
+        with running:
+            events.close()
+
+    try:
+        while True:
+            event = await loop.run_in_executor(None, step)
+            if event is _DONE:
+                break
+            yield event
+    finally:
+        if running.acquire(blocking=False):
+            try:
+                events.close()
+            finally:
+                running.release()
+        else:
+            # Cancelled while waiting for an event: close once that step returns
+            loop.run_in_executor(None, close)
@@ -1,152 +1,324 @@
 from crewai.tools import BaseTool
-from google import genai
-from google.genai.types import GenerateContentConfig, Modality
 from PIL import Image, ImageDraw, ImageFont
-from typing import List, Optional, Tuple, Type, Dict
-from pydantic import BaseModel
-from tale_weaver.model.storybook import Storybook
-import io
+from typing import Callable, List, Optional, Tuple, Type
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from tale_weaver.model.storybook import Character, Page, Storybook
+from tale_weaver.tools.image_backend import ImageBackend, get_image_backend
+from tale_weaver.utils.asset_store import asset_dir, book_assets
+from tale_weaver.utils.console import print_line
+from tale_weaver.utils.disk_cache import env_flag
+from tale_weaver.utils.env import load_env
+from tale_weaver.utils.image_cache import get_image_cache, image_cache_enabled, image_cache_key
+from tale_weaver.utils.image_output import get_image_writer
+from tale_weaver.utils.manifest import IllustrationManifest, manifest_path_for, plan_assets
+from tale_weaver.utils.montage_store import get_montage_store
+from tale_weaver.utils.rate_limiter import get_image_rate_limiter
+from tale_weaver.utils.scheduler import DependencyScheduler
+from tale_weaver.utils import tracing
+from functools import lru_cache, partial
 import math
 import os
+import shutil
 import tempfile
-import hashlib
+import threading
+import time
 
-from dotenv import load_dotenv
-load_dotenv()
-
-# Initialize Gemini client for image generation
-try:
-    gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-except Exception as e:
-    print(f"Error initializing Gemini client: {e}. Please ensure GEMINI_API_KEY is valid.")
-    gemini_client = None
+# FreeType faces are shared by all threads building merges
+_font_lock = threading.Lock()
 
 def _ensure_dir(path: Optional[str]):
     if path:
         os.makedirs(path, exist_ok=True)
 
+def _merge_label(path: str) -> str:
+    # "<tmp>_character_<name>.png" -> "<NAME>"
+    return os.path.splitext(os.path.basename(path).split("_")[-1])[0].upper()
+
+@lru_cache(maxsize=8)
+def _load_font(size: int):
+    """Resolve the label font once per size instead of probing font files on every merge."""
+    for name in ["DejaVuSans-Bold.ttf", "DejaVuSans.ttf",
+                 "Arial.ttf", "Helvetica.ttf", "LiberationSans-Bold.ttf"]:
+        try:
+            return ImageFont.truetype(name, size=size)
+        except Exception:
+            pass
+    return ImageFont.load_default()
+
+@lru_cache(maxsize=256)
+def _label_sprite(text: str, font_size: int) -> Image.Image:
+    """
+    Render a label once as an "L" mask sized to its text box; the mask is pasted
+    with the text color and its size gives the label metrics.
+    """
+    font = _load_font(font_size)
+    with _font_lock:
+        w, h = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox((0, 0), text, font=font)[2:]
+        sprite = Image.new("L", (max(1, w), max(1, h)), 0)
+        ImageDraw.Draw(sprite).text((0, 0), text, fill=255, font=font)
+    return sprite
+
+@lru_cache(maxsize=64)
+def _cached_thumbnail(path: str, mtime_ns: int, file_size: int, thumb_size: Tuple[int, int]) -> Image.Image:
+    img = Image.open(path).convert("RGB")
+    iw, ih = img.size
+    scale = min(thumb_size[0] / iw, thumb_size[1] / ih)
+    nw, nh = max(1, int(iw * scale)), max(1, int(ih * scale))
+    return img.resize((nw, nh), Image.Resampling.LANCZOS)
+
+def _load_thumbnail(path: str, thumb_size: Tuple[int, int]) -> Image.Image:
+    """
+    Return the decoded RGB image at `path` resized to fit `thumb_size`.
+
+    Thumbnails are shared across merges (process-wide, bounded LRU) and keyed on the
+    file's mtime and size too, so a rewritten file is decoded again. The returned
+    image must not be modified.
+    """
+    st = os.stat(path)
+    return _cached_thumbnail(path, st.st_mtime_ns, st.st_size, tuple(thumb_size))
+
+
+class IllustrationCancelled(Exception):
+    """Raised in place of an image that was not started because the run was cancelled."""
+
+
+def _set_asset_path(storybook: Storybook, key: str, path: str):
+    kind, _, ref = key.partition(":")
+    if kind == "character":
+        storybook.characters[ref].character_image_path = path
+    elif kind == "scene":
+        storybook.pages[int(ref) - 1].scene_image_path = path
+    else:
+        storybook.storybook_image_path = path
+
 class IllustrationTool(BaseTool):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     name: str = "Illustration_tool"
     description: str = (
         "Create illustration for the given storybook."
     )
     args_schema: Type[BaseModel] = Storybook
-    _merge_cache: Dict[str, str] = {}
+    max_workers: int = Field(default_factory=lambda: int(os.getenv("ILLUSTRATION_WORKERS", "4")),
+                             description="Maximum number of images generated concurrently.")
+    incremental: bool = Field(default_factory=lambda: env_flag("ILLUSTRATION_INCREMENTAL"),
+                              description="Reuse images whose inputs did not change since the last run.")
+    backend: Optional[ImageBackend] = Field(default=None, exclude=True,
+                                            description="Image backend; defaults to the one selected by IMAGE_BACKEND.")
+
+    @model_validator(mode="before")
+    @classmethod
+    def _read_env(cls, data):
+        # Runs before the default factories, which read the environment
+        load_env()
+        return data
+
+    @property
+    def image_backend(self) -> ImageBackend:
+        return self.backend or get_image_backend()
 
     def _run(self, **data) -> Storybook:
+        storybook = Storybook(**data) if not isinstance(data, Storybook) else data
+        return self.illustrate(storybook)
+
+    def illustrate(self, storybook: Storybook, on_asset: Optional[Callable[[str, str], None]] = None,
+                   manifest: Optional[IllustrationManifest] = None, incremental: Optional[bool] = None,
+                   cancelled: Optional[Callable[[], bool]] = None, book_key: Optional[str] = None) -> Storybook:
+        """
+        Generate every illustration of the storybook, filling its image paths in place.
+        Images are written to the book's asset directory, `OUTPUT_DIR/books/<book id>`.
+
+        The inputs and output of every image are checkpointed to the book's manifest as
+        soon as it is saved. A failed image only skips the images that depend on it (a
+        character's scenes and the cover); the failures are recorded in the manifest. In
+        incremental mode, images whose prompt and character references are unchanged
+        since the manifest was written are reused instead of generated again, so running
+        again after a failure only generates the missing images.
+
+        Args:
+            storybook: The storybook to illustrate.
+            on_asset: Optional callback invoked from worker threads as soon as each image
+                is saved (or reused), with the asset key ("character:<name>", "scene:<n>"
+                with n the 1-based page position, or "cover") and the image path.
+            manifest: Manifest to compare against and update; defaults to the book's one
+                under `OUTPUT_DIR/manifests`.
+            incremental: Reuse unchanged images; defaults to the tool's `incremental` field.
+            cancelled: Polled before each image starts; once it returns True, the images
+                not started yet are recorded as failed (and can be resumed later).
+            book_key: Identity of the book (a batch item or job id), naming its manifest and
+                asset directory; defaults to the title, which two books may share.
+
+        Returns:
+            Storybook: The same storybook with its image paths set.
+        """
         try:
             _ensure_dir(os.getenv("OUTPUT_DIR", None))
-            storybook = Storybook(**data) if not isinstance(data, Storybook) else data
-            # Iterate over characters to create single image of each one
-            all_char_img_paths = []
+            book = storybook.storybook_title
+            book_key = book_key or (manifest.book_key if manifest else None) or book
+            manifest = manifest or IllustrationManifest(manifest_path_for(storybook, book_key=book_key))
+            incremental = self.incremental if incremental is None else incremental
+            plan = plan_assets(storybook, self.image_backend.model)
+            manifest.storybook = storybook.model_dump()
+            manifest.book_key = book_key
+            reused = set()
+
+            def completed(key, path):
+                manifest.record(key, *plan[key], path)
+                manifest.save()
+                if on_asset:
+                    on_asset(key, path)
+
+            scheduler = DependencyScheduler(
+                max_workers=self.max_workers,
+                on_complete=completed,
+                on_start=lambda key, queued: tracing.record_span("image.queue", time.time() - queued, queued,
+                                                                 book=book, asset=key),
+                isolate_failures=True
+            )
 
+            def submit(key, fn, deps=()):
+                path = manifest.reusable(key, *plan[key]) if incremental else None
+                if path:
+                    _set_asset_path(storybook, key, path)
+                    reused.add(key)
+                    completed(key, path)
+                    return
+                scheduler.submit(key, partial(self._run_asset, book, key, fn, cancelled, book_key),
+                                 deps=[d for d in deps if d not in reused])
+
+            # Characters first: every scene and the cover use their images as reference
+            character_keys = []
             for name, character in storybook.characters.items():
-                character.character_image_path = self._generate_image_from_prompt(prompt=character.character_prompt, 
-                                                                                  image_suffix=f"_character_{name}.png")
-                all_char_img_paths.append(character.character_image_path)
-            
-            # Iterate over pages to create image of each scene
+                key = f"character:{name}"
+                submit(key, partial(self._illustrate_character, name, character))
+                character_keys.append(key)
+
+            # Each scene waits only for the characters appearing in it
             for page_number, page in enumerate(storybook.pages, 1):
-                char_image_paths = [ storybook.characters[character].character_image_path for character in page.characters ]
-                page.scene_image_path = self._generate_image_from_prompt(page.scene_prompt, 
-                                                                         f'_scene_{page_number}.png', 
-                                                                         char_image_paths)
-
-            # Create cover image
-            storybook.storybook_image_path = self._generate_image_from_prompt(
-                prompt=storybook.storybook_prompt,
-                image_suffix=f"_cover_{storybook.storybook_title}.png",
-                image_paths=all_char_img_paths
-            )
+                deps = [f"character:{c}" for c in page.characters if c in storybook.characters]
+                submit(f"scene:{page_number}",
+                       partial(self._illustrate_scene, storybook, page, page_number),
+                       deps=deps)
+
+            # Cover runs alongside the scenes once all the characters are ready
+            submit("cover", partial(self._illustrate_cover, storybook), deps=character_keys)
+            with tracing.span("illustrate", book=book, workers=self.max_workers,
+                              images=len(plan) - len(reused), reused=len(reused)):
+                try:
+                    scheduler.join()
+                finally:
+                    for key, error in scheduler.errors.items():
+                        manifest.record_failure(key, str(error))
+                    for key in scheduler.skipped:
+                        manifest.record_failure(key, "skipped: a character it depends on failed")
+                    manifest.prune(plan)
+                    manifest.save()
+            if reused:
+                print(f"Reused {len(reused)} unchanged images, generated {len(plan) - len(reused)}")
+            if scheduler.errors or scheduler.skipped:
+                print(f"{len(scheduler.errors)} images failed and {len(scheduler.skipped)} were skipped; "
+                      f"resume with: resume {manifest.path}")
+
+            if image_cache_enabled():
+                stats = get_image_cache().stats()
+                print(f"Image cache: {stats['hits']} hits, {stats['misses']} misses")
 
         except Exception as e:
             error_msg = f"An error occurs during image generation: {str(e)}"
             print(error_msg)
         return storybook
-    
 
-    def _merge_cache_key(self, image_paths: List[str]) -> str:
-        # Key based on sorted names
-        parts = [os.path.splitext(os.path.basename(p))[0] for p in image_paths]
-        key_str = "|".join(sorted(parts))
-        return hashlib.sha1(key_str.encode("utf-8")).hexdigest()
+    @staticmethod
+    def _run_asset(book: str, key: str, fn: Callable[[], str], cancelled: Optional[Callable[[], bool]] = None,
+                   book_key: Optional[str] = None) -> str:
+        if cancelled is not None and cancelled():
+            raise IllustrationCancelled(f"{key} cancelled")
+        with tracing.tags(book=book, asset=key), book_assets(book_key or book):
+            return fn()
+
+    def _illustrate_character(self, name: str, character: Character) -> str:
+        character.character_image_path = self._generate_image_from_prompt(prompt=character.character_prompt,
+                                                                          image_suffix=f"_character_{name}.png")
+        return character.character_image_path
+
+    def _illustrate_scene(self, storybook: Storybook, page: Page, page_number: int) -> str:
+        char_image_paths = [ storybook.characters[character].character_image_path for character in page.characters ]
+        page.scene_image_path = self._generate_image_from_prompt(page.scene_prompt,
+                                                                 f'_scene_{page_number}.png',
+                                                                 char_image_paths)
+        return page.scene_image_path
+
+    def _illustrate_cover(self, storybook: Storybook) -> str:
+        all_char_img_paths = [character.character_image_path for character in storybook.characters.values()]
+        storybook.storybook_image_path = self._generate_image_from_prompt(
+            prompt=storybook.storybook_prompt,
+            image_suffix=f"_cover_{storybook.storybook_title}.png",
+            image_paths=all_char_img_paths
+        )
+        return storybook.storybook_image_path
 
     def _generate_image_from_prompt(self, prompt: str, image_suffix: str, image_paths: Optional[List[str]] = None) -> str:
         """
-        Generate an image from a text prompt using Gemini.
+        Generate an image from a text prompt using the configured image backend.
         
         Args:
             prompt: Text prompt for image generation
-            scene_number: Scene number for naming
+            image_suffix: Suffix of the image file to save
+            image_paths: Character images to send as reference, merged into one montage
             
         Returns:
             str: Path to the generated image file
         """
-        if not gemini_client:
-            raise ValueError("Gemini client not initialized")
-        
-        print(f"Generating image {image_suffix}: {prompt[:50]}...")
-
-        contents = [prompt]
-        if image_paths:
-            merge_path = self._get_or_create_merge(image_paths)
-            contents.append(Image.open(merge_path))
-        
-        response = gemini_client.models.generate_content(
-            model=os.getenv("GEMINI_IMAGE_MODEL"),
-            contents=contents,
-            config=GenerateContentConfig(
-                    response_modalities=[Modality.IMAGE]#, Modality.TEXT]
-                )
-        )
-        
-        # Extract image from response
-        image_part = None
-        for part in response.candidates[0].content.parts:
-            if part.inline_data is not None:
-                image_part = part
-                break
-            
-        if not image_part:
-            raise ValueError("No image generated in response")
-        
-        # Process and save image
-        img_data = image_part.inline_data.data
-        image = Image.open(io.BytesIO(img_data))
-        
-        # Convert image format if needed
-        if image.mode in ('P', 'PA'):
-            image = image.convert('RGB')
-        elif image.mode == 'RGBA':
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            background.paste(image, mask=image.split()[-1])
-            image = background
-            
-        # Save to temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=image_suffix, dir=os.getenv("OUTPUT_DIR", None))
-        image.save(temp_file.name, 'PNG')
-        temp_file.close()
+        with tracing.span("image.generate", prompt_chars=len(prompt)) as sp:
+            path = self._generate_image(prompt, image_suffix, image_paths)
+            sp.set(bytes=os.path.getsize(path))
+            return path
+
+    def _generate_image(self, prompt: str, image_suffix: str, image_paths: Optional[List[str]] = None) -> str:
+        model = self.image_backend.model
+        writer = get_image_writer()
+        merge_path = self._get_or_create_merge(image_paths) if image_paths else None
+
+        # Identical model, prompt and reference montage: reuse the previous image
+        cache_key = None
+        if image_cache_enabled():
+            cache_key = image_cache_key(model, prompt, [merge_path] if merge_path else None, writer.signature)
+            cached_path = get_image_cache().get(cache_key)
+            if cached_path:
+                with tracing.span("image.cache_hit", bytes=os.path.getsize(cached_path)):
+                    suffix = os.path.splitext(image_suffix)[0] + os.path.splitext(cached_path)[1]
+                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=asset_dir())
+                    temp_file.close()
+                    shutil.copyfile(cached_path, temp_file.name)
+                print_line(f"Image {image_suffix} reused from cache: {temp_file.name}")
+                return temp_file.name
+
+        print_line(f"Generating image {image_suffix}: {prompt[:50]}...")
+
+        with tracing.span("image.network", model=model, reference=bool(merge_path)) as sp:
+            img_data = get_image_rate_limiter().call(
+                lambda: self.image_backend.generate(prompt, reference_path=merge_path))
+            sp.set(bytes=len(img_data))
+
+        with tracing.span("image.save") as sp:
+            path = writer.write(img_data, image_suffix, asset_dir())
+            sp.set(bytes=os.path.getsize(path))
+
+        if cache_key:
+            get_image_cache().put(cache_key, path, suffix=os.path.splitext(path)[1])
         
-        print(f"Image {image_suffix} saved to: {temp_file.name}")
-        return temp_file.name    
+        print_line(f"Image {image_suffix} saved to: {path}")
+        return path
 
     def _get_or_create_merge(self, image_paths: List[str]) -> str:
         """
-        Returns the character merge path if exists otherwise creates it and updates cache.
+        Returns the character merge path from the montage store, creating it if missing.
         """
-        cache_key = self._merge_cache_key(image_paths)
-
-        # Reuse if exist
-        cached_path = self._merge_cache.get(cache_key)
-        if cached_path and os.path.exists(cached_path):
-            return cached_path
-
-        # Create otherwise
-        self._merge_cache[cache_key] = self._build_labeled_merge(
-            image_paths=image_paths,
-            image_suffix=f"merge_{cache_key}.png"
+        return get_montage_store().get_or_create(
+            image_paths,
+            label_for=_merge_label,
+            build=lambda paths, key: self._build_labeled_merge(image_paths=paths, image_suffix=f"merge_{key}.png")
         )
-        return self._merge_cache.get(cache_key)
 
     def _build_labeled_merge(
         self,
@@ -188,23 +360,19 @@ class IllustrationTool(BaseTool):
         if not image_paths:
             raise ValueError("image_paths must contain at least one path")
 
-        # Load a fixed font
-        def load_font(size: int):
-            for name in ["DejaVuSans-Bold.ttf", "DejaVuSans.ttf",
-                         "Arial.ttf", "Helvetica.ttf", "LiberationSans-Bold.ttf"]:
-                try:
-                    return ImageFont.truetype(name, size=size)
-                except Exception:
-                    pass
-            return ImageFont.load_default()
-
-        font = load_font(font_size)
-        titles = [os.path.splitext(os.path.basename(p).split("_")[-1])[0].upper() for p in image_paths]
-
-        tmp = Image.new("RGB", (10, 10))
-        dtmp = ImageDraw.Draw(tmp)
-        max_label_w = max(dtmp.textbbox((0, 0), t, font=font)[2] for t in titles)
-        label_h = dtmp.textbbox((0, 0), "Hg", font=font)[3]
+        with tracing.span("montage.build", images=len(image_paths)) as sp:
+            path = self._compose_labeled_merge(image_paths, image_suffix, thumb_size, font_size, cols,
+                                               bg_color, text_color, padding, cell_padding)
+            sp.set(bytes=os.path.getsize(path))
+            return path
+
+    def _compose_labeled_merge(self, image_paths, image_suffix, thumb_size, font_size, cols,
+                               bg_color, text_color, padding, cell_padding) -> str:
+
+        titles = [_merge_label(p) for p in image_paths]
+        labels = [_label_sprite(t, font_size) for t in titles]
+        max_label_w = max(label.width for label in labels)
+        label_h = _label_sprite("Hg", font_size).height
         label_height = label_h + 10
 
         cell_w = max(thumb_size[0] + 2 * cell_padding, max_label_w + 2 * cell_padding)
@@ -218,24 +386,19 @@ class IllustrationTool(BaseTool):
         out_h = padding * 2 + cell_h * rows
 
         canvas = Image.new("RGB", (out_w, out_h), bg_color)
-        draw = ImageDraw.Draw(canvas)
 
-        for i, (p, title) in enumerate(zip(image_paths, titles)):
-            img = Image.open(p).convert("RGB")
-
-            iw, ih = img.size
-            scale = min(thumb_size[0] / iw, thumb_size[1] / ih)
-            nw, nh = max(1, int(iw * scale)), max(1, int(ih * scale))
-            img = img.resize((nw, nh), Image.Resampling.LANCZOS)
+        for i, (p, label) in enumerate(zip(image_paths, labels)):
+            img = _load_thumbnail(p, thumb_size)
+            nw, nh = img.size
 
             r, c = divmod(i, cols)
             x0 = padding + c * cell_w
             y0 = padding + r * cell_h
 
-            tw, th = draw.textbbox((0, 0), title, font=font)[2:]
+            tw, th = label.size
             tx = x0 + (cell_w - tw) // 2
             ty = y0 + cell_padding + (label_height - th) // 2
-            draw.text((tx, ty), title, fill=text_color, font=font)
+            canvas.paste(text_color, (tx, ty, tx + tw, ty + th), label)
 
             ix = x0 + (cell_w - nw) // 2
             iy = y0 + label_height + (cell_h - label_height - nh) // 2
@@ -252,6 +415,8 @@ class IllustrationTool(BaseTool):
         offset = ((target_w - new_w) // 2, (target_h - new_h) // 2)
         final_canvas.paste(resized, offset)
 
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=image_suffix, dir=os.getenv("OUTPUT_DIR", None))
+        # Moved into the montage store right away; a leftover (crash) is reclaimed by `gc`
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=image_suffix, dir=asset_dir())
         final_canvas.save(temp_file.name, "PNG")
+        temp_file.close()
         return temp_file.name
\ No newline at end of file
@@ -0,0 +1,393 @@
+import hashlib
+import io
+import mimetypes
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+from PIL import Image, ImageDraw
+
+from tale_weaver.utils.console import print_line
+from tale_weaver.utils.disk_cache import env_flag
+from tale_weaver.utils.rate_limiter import error_status
+
+# Gemini deletes uploaded files after 48 hours; handles are dropped a little earlier
+REFERENCE_HANDLE_TTL = 46 * 3600
+# Errors meaning an uploaded reference is gone or not readable (expired, deleted, other key)
+_REJECTED_HANDLE = {403, 404, "PERMISSION_DENIED", "NOT_FOUND"}
+
+
+def _rejects_handle(exc: BaseException, handle: object) -> bool:
+    """
+    Whether `exc` is the service refusing the uploaded file `handle` itself (a 404 or
+    403, or a 400 whose message names the file), rather than the rest of the request.
+    """
+    if error_status(exc) in _REJECTED_HANDLE or getattr(exc, "status", None) in _REJECTED_HANDLE:
+        return True
+    if error_status(exc) == 400:
+        message = str(exc)
+        return any(ref and ref in message for ref in (getattr(handle, "uri", None), getattr(handle, "name", None)))
+    return False
+
+
+class ImageBackendError(Exception):
+    """An image generation request failed; `code` mirrors the HTTP status when known."""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class ImageBackend(ABC):
+    """
+    Interface of the image generation services used by `IllustrationTool`.
+
+    Implementations must be safe to call from several threads at once.
+    """
+
+    #: Model identifier; part of the illustration cache key.
+    model: str = ""
+
+    @abstractmethod
+    def generate(self, prompt: str, reference_path: Optional[str] = None) -> bytes:
+        """
+        Generate an image.
+
+        Args:
+            prompt: Text prompt for image generation.
+            reference_path: Optional reference image (the character montage).
+
+        Returns:
+            bytes: The encoded image (PNG, JPEG, ...).
+        """
+
+    def reference_stats(self) -> Dict[str, int]:
+        """Counts of the reference images uploaded, reused and sent inline (empty if not tracked)."""
+        return {}
+
+
+@lru_cache(maxsize=1024)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def reference_digest(path: str) -> str:
+    """Content hash of a reference image, computed once per file version."""
+    st = os.stat(path)
+    return _file_digest(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+class ReferenceUploads:
+    """
+    Handles of the reference images uploaded to an image service, by content hash.
+
+    A character montage is shared by every scene with the same characters, so it is
+    uploaded once and the following requests refer to its handle instead of carrying
+    the image again. Concurrent requests for the same montage wait for a single
+    upload. A montage whose upload failed is sent inline until the upload is tried
+    again, `ttl` seconds later. Expired entries are evicted on each lookup.
+
+    Args:
+        upload: Uploads a file and returns its handle.
+        enabled: When off, every reference is sent inline (and only counted).
+        ttl: Seconds after which a handle is uploaded again, or a failed upload retried.
+    """
+
+    def __init__(self, upload: Callable[[str], object], enabled: bool = True, ttl: float = REFERENCE_HANDLE_TTL):
+        self._upload = upload
+        self.enabled = enabled
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._uploading: Dict[str, threading.Lock] = {}
+        self._handles: Dict[str, tuple] = {}
+        self._failed: Dict[str, float] = {}
+        self.uploads = 0
+        self.upload_bytes = 0
+        self.upload_failures = 0
+        self.reused = 0
+        self.rejected = 0
+        self.inline = 0
+        self.inline_bytes = 0
+
+    def _fresh(self, digest: str) -> Optional[object]:
+        entry = self._handles.get(digest)
+        if entry and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def _prune(self) -> None:
+        # Called under self._lock: montages of finished books are not looked up again
+        expired = time.monotonic() - self.ttl
+        for digest in [d for d, (_, uploaded) in self._handles.items() if uploaded <= expired]:
+            del self._handles[digest]
+        for digest in [d for d, failed in self._failed.items() if failed <= expired]:
+            del self._failed[digest]
+
+    def handle(self, path: str) -> Optional[object]:
+        """
+        Handle of the uploaded reference, uploading it on first use.
+
+        Returns:
+            The handle, or None if the reference must be sent inline.
+        """
+        if not self.enabled:
+            return None
+        digest = reference_digest(path)
+        with self._lock:
+            self._prune()
+            if digest in self._failed:
+                return None
+            handle = self._fresh(digest)
+            if handle is not None:
+                self.reused += 1
+                return handle
+            uploading = self._uploading.setdefault(digest, threading.Lock())
+        with uploading:
+            with self._lock:
+                handle = self._fresh(digest)
+                if handle is not None:
+                    self.reused += 1
+                    return handle
+                if digest in self._failed:
+                    return None
+            try:
+                handle = self._upload(path)
+            except Exception as e:
+                print_line(f"Reference upload failed, sending it inline: {e}")
+                handle = None
+            with self._lock:
+                if handle is None:
+                    self.upload_failures += 1
+                    self._failed[digest] = time.monotonic()
+                else:
+                    self._handles[digest] = (handle, time.monotonic())
+                    self.uploads += 1
+                    self.upload_bytes += os.path.getsize(path)
+                # Waiters already hold this lock; later lookups find the outcome above
+                if self._uploading.get(digest) is uploading:
+                    del self._uploading[digest]
+            return handle
+
+    def forget(self, path: str) -> None:
+        """Drop the handle of a reference the service rejected; the next request uploads it again."""
+        with self._lock:
+            self._handles.pop(reference_digest(path), None)
+            self.rejected += 1
+
+    def record_inline(self, path: str) -> None:
+        with self._lock:
+            self.inline += 1
+            self.inline_bytes += os.path.getsize(path)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"uploads": self.uploads, "reused": self.reused, "inline": self.inline,
+                    "upload_bytes": self.upload_bytes, "inline_bytes": self.inline_bytes,
+                    "upload_failures": self.upload_failures, "rejected": self.rejected}
+
+
+class GeminiImageBackend(ImageBackend):
+    """
+    Image generation through the Gemini API (GEMINI_API_KEY, GEMINI_IMAGE_MODEL).
+
+    Reference montages are uploaded once through the Files API and referred to by
+    handle (see `ReferenceUploads`), unless `upload_references` (IMAGE_REFERENCE_UPLOAD)
+    is off. A request whose handle is rejected is sent again with the image inline.
+    """
+
+    def __init__(self, model: Optional[str] = None, api_key: Optional[str] = None,
+                 upload_references: Optional[bool] = None):
+        self.model = model or os.getenv("GEMINI_IMAGE_MODEL") or ""
+        self._api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+        if upload_references is None:
+            upload_references = env_flag("IMAGE_REFERENCE_UPLOAD", True)
+        self.references = ReferenceUploads(self._upload_reference, enabled=upload_references)
+
+    @property
+    def client(self):
+        # Created on first use so that importing the tool needs neither network nor key
+        with self._lock:
+            if self._client is None:
+                from google import genai
+                try:
+                    self._client = genai.Client(api_key=self._api_key or os.getenv("GEMINI_API_KEY"))
+                except Exception as e:
+                    raise ValueError(f"Gemini client not initialized: {e}. Please ensure GEMINI_API_KEY is valid.")
+            return self._client
+
+    def _upload_reference(self, path: str):
+        mime_type = mimetypes.guess_type(path)[0] or "image/png"
+        return self.client.files.upload(file=path, config={"mime_type": mime_type})
+
+    def _inline_reference(self, path: str) -> Image.Image:
+        self.references.record_inline(path)
+        return Image.open(path)
+
+    def generate(self, prompt: str, reference_path: Optional[str] = None) -> bytes:
+        from google.genai.types import GenerateContentConfig, Modality
+
+        config = GenerateContentConfig(
+            response_modalities=[Modality.IMAGE]#, Modality.TEXT]
+        )
+        contents = [prompt]
+        handle = None
+        if reference_path:
+            handle = self.references.handle(reference_path)
+            contents.append(handle if handle is not None else self._inline_reference(reference_path))
+
+        try:
+            response = self.client.models.generate_content(model=self.model, contents=contents, config=config)
+        except Exception as e:
+            if handle is None or not _rejects_handle(e, handle):
+                raise
+            # The uploaded file expired or was deleted: upload it again next time
+            print_line(f"Uploaded reference rejected ({e}), sending it inline")
+            self.references.forget(reference_path)
+            contents[-1] = self._inline_reference(reference_path)
+            response = self.client.models.generate_content(model=self.model, contents=contents, config=config)
+
+        # Extract image from response
+        for part in response.candidates[0].content.parts:
+            if part.inline_data is not None:
+                return part.inline_data.data
+        raise ValueError("No image generated in response")
+
+    def reference_stats(self) -> Dict[str, int]:
+        return self.references.stats()
+
+
+class LocalImageBackend(ImageBackend):
+    """
+    Offline stand-in producing deterministic synthetic images, for benchmarks and load tests.
+
+    The same prompt and reference always give the same image. Latency and failures are
+    simulated: each call sleeps `latency` seconds (plus up to `jitter`) and fails with
+    probability `error_rate`, raising `ImageBackendError` with code `error_code`. Random
+    draws come from a generator seeded with `seed`, so runs are reproducible.
+
+    Sending a reference image costs `upload_latency` seconds, once per montage when
+    references are uploaded (`upload_references`), on every call when they are inline.
+
+    Args:
+        size: (width, height) of the generated images.
+        latency: Base simulated latency in seconds.
+        jitter: Maximum extra random latency in seconds.
+        error_rate: Probability in [0, 1] that a call fails.
+        error_code: Status code carried by injected failures (e.g. 429 or 503).
+        seed: Seed of the latency/error generator.
+        upload_latency: Simulated time to send a reference image.
+        upload_references: Upload references once and reuse their handle; defaults to
+            IMAGE_REFERENCE_UPLOAD.
+    """
+
+    model = "local-standin"
+
+    def __init__(self, size=(724, 1024), latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_code: int = 503, seed: int = 23,
+                 upload_latency: float = 0.0, upload_references: Optional[bool] = None):
+        self.size = tuple(size)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.upload_latency = upload_latency
+        if upload_references is None:
+            upload_references = env_flag("IMAGE_REFERENCE_UPLOAD", True)
+        self.references = ReferenceUploads(self._upload_reference, enabled=upload_references)
+
+    @classmethod
+    def from_env(cls) -> "LocalImageBackend":
+        return cls(
+            latency=float(os.getenv("LOCAL_IMAGE_LATENCY", "0")),
+            jitter=float(os.getenv("LOCAL_IMAGE_JITTER", "0")),
+            error_rate=float(os.getenv("LOCAL_IMAGE_ERROR_RATE", "0")),
+            error_code=int(os.getenv("LOCAL_IMAGE_ERROR_CODE", "503")),
+            seed=int(os.getenv("LOCAL_IMAGE_SEED", "23")),
+            upload_latency=float(os.getenv("LOCAL_IMAGE_UPLOAD_LATENCY", "0")),
+        )
+
+    def _upload_reference(self, path: str) -> str:
+        time.sleep(self.upload_latency)
+        return reference_digest(path)
+
+    def generate(self, prompt: str, reference_path: Optional[str] = None) -> bytes:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        time.sleep(delay)
+        if fail:
+            raise ImageBackendError(f"Injected failure ({self.error_code})", code=self.error_code)
+
+        digest = hashlib.sha256(prompt.encode("utf-8"))
+        if reference_path:
+            handle = self.references.handle(reference_path)
+            if handle is None:
+                self.references.record_inline(reference_path)
+                time.sleep(self.upload_latency)
+                handle = reference_digest(reference_path)
+            digest.update(handle.encode("ascii"))
+        return self._render(digest.digest())
+
+    def _render(self, seed: bytes) -> bytes:
+        rng = random.Random(seed)
+        w, h = self.size
+        top = tuple(rng.randrange(256) for _ in range(3))
+        bottom = tuple(rng.randrange(256) for _ in range(3))
+        # Vertical gradient built from a 1px column, then a few shapes
+        column = Image.new("RGB", (1, h))
+        column.putdata([tuple(top[i] + (bottom[i] - top[i]) * y // max(1, h - 1) for i in range(3)) for y in range(h)])
+        img = column.resize((w, h))
+        draw = ImageDraw.Draw(img)
+        for _ in range(6):
+            x0, y0 = rng.randrange(w), rng.randrange(h)
+            r = rng.randrange(20, max(21, w // 4))
+            draw.ellipse((x0 - r, y0 - r, x0 + r, y0 + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+        return buf.getvalue()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors}
+
+    def reference_stats(self) -> Dict[str, int]:
+        return self.references.stats()
+
+
+_backend: Optional[ImageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_image_backend() -> ImageBackend:
+    """
+    Return the process-wide image backend selected by `IMAGE_BACKEND`:
+    "gemini" (default) or "local" (see `LocalImageBackend.from_env`).
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            kind = (os.getenv("IMAGE_BACKEND") or "gemini").strip().lower()
+            if kind == "gemini":
+                _backend = GeminiImageBackend()
+            elif kind == "local":
+                _backend = LocalImageBackend.from_env()
+            else:
+                raise ValueError(f"Unknown IMAGE_BACKEND '{kind}' (expected 'gemini' or 'local')")
+        return _backend
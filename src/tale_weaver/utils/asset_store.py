@@ -0,0 +1,178 @@
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+
+from tale_weaver.utils.manifest import book_id
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+# Key of the book whose images are being generated in the current thread / task
+_current_book: ContextVar[Optional[str]] = ContextVar("tale_weaver_current_book", default=None)
+
+
+def books_root(output_dir: Optional[str] = None) -> str:
+    return os.path.join(output_dir or os.getenv("OUTPUT_DIR") or "./", "books")
+
+
+def book_dir(book_key: str, output_dir: Optional[str] = None) -> str:
+    """Asset directory of a storybook: `<output_dir>/books/<book id>`, from its key (or title)."""
+    return os.path.join(books_root(output_dir), book_id(book_key))
+
+
+@contextmanager
+def book_assets(book_key: str) -> Iterator[None]:
+    """Write the images generated in this block into the asset directory of `book_key`."""
+    token = _current_book.set(book_key)
+    try:
+        yield
+    finally:
+        _current_book.reset(token)
+
+
+def asset_dir() -> str:
+    """
+    Directory new images are written to: the asset directory of the current book
+    (created if needed). The path is absolute, so the storybooks and manifests
+    referencing the images stay valid whatever the working directory of their reader.
+    """
+    directory = os.path.abspath(book_dir(_current_book.get() or ""))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+@dataclass
+class GCReport:
+    referenced: int = 0
+    kept_recent: int = 0
+    files_removed: int = 0
+    bytes_freed: int = 0
+    removed: List[str] = field(default_factory=list)
+
+
+class AssetStore:
+    """
+    Reference counting and garbage collection of the images of an output directory.
+
+    Images live in one directory per book (`<output_dir>/books/<book id>`). An image
+    is referenced by every storybook JSON of the output directory that uses it (read
+    through the library index) and by every illustration manifest that records it, so
+    an interrupted run can still be resumed. Library thumbnails are referenced by their
+    book. Everything else under `books/`, the thumbnails of deleted books and the
+    temporary images older versions wrote directly into the output directory are
+    orphans: images of failed runs, images replaced when a book was regenerated and
+    leftover montage files.
+
+    Older runs recorded paths relative to their working directory, which the GC may
+    not share: a relative reference protects the file it names relative to the output
+    directory or to any of its parents, as well as to the current directory.
+
+    Args:
+        output_dir: The output directory; defaults to `OUTPUT_DIR`.
+        library: Library index of the output directory; defaults to `get_library(output_dir)`.
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, library=None):
+        from tale_weaver.utils.library import get_library
+
+        self.output_dir = os.path.abspath(output_dir or os.getenv("OUTPUT_DIR") or "./")
+        self.library = library or get_library(self.output_dir)
+
+    def _resolve(self, path: str) -> Set[str]:
+        """Absolute paths a recorded reference may designate."""
+        if os.path.isabs(path):
+            return {os.path.normpath(path)}
+        candidates = {os.path.abspath(path)}
+        base = self.output_dir
+        while True:
+            candidate = os.path.normpath(os.path.join(base, path))
+            if os.path.exists(candidate):
+                candidates.add(candidate)
+            parent = os.path.dirname(base)
+            if parent == base:
+                return candidates
+            base = parent
+
+    def refcounts(self) -> Dict[str, int]:
+        """Number of storybooks and manifests referencing each file (absolute paths)."""
+        counts: Counter = Counter()
+        self.library.sync(self.output_dir)
+        for paths in self.library.asset_references().values():
+            counts.update({r for p in paths for r in self._resolve(p)})
+        manifests = os.path.join(self.output_dir, "manifests")
+        if os.path.isdir(manifests):
+            for entry in os.scandir(manifests):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        assets = json.load(f).get("assets", {})
+                except Exception as e:
+                    print(f"GC: could not read {entry.path}: {e}")
+                    continue
+                counts.update({r for a in assets.values() if a.get("path") for r in self._resolve(a["path"])})
+        return dict(counts)
+
+    def _candidates(self) -> Iterator[str]:
+        root = books_root(self.output_dir)
+        for directory, _, files in os.walk(root):
+            for name in files:
+                yield os.path.join(directory, name)
+        # Images written by the tool before per-book directories existed
+        for entry in os.scandir(self.output_dir):
+            if entry.is_file() and entry.name.startswith("tmp") and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry.path
+        if os.path.isdir(self.library.thumbnail_dir):
+            for entry in os.scandir(self.library.thumbnail_dir):
+                if entry.is_file():
+                    yield os.path.abspath(entry.path)
+
+    def collect(self, dry_run: bool = False, grace_seconds: float = 3600) -> GCReport:
+        """
+        Delete the unreferenced files.
+
+        Args:
+            dry_run: Only report what would be deleted.
+            grace_seconds: Files modified more recently are kept: a run in progress
+                may not have recorded them yet.
+
+        Returns:
+            GCReport: Counts and bytes freed.
+        """
+        references = self.refcounts()
+        report = GCReport()
+        cutoff = time.time() - grace_seconds
+        for path in self._candidates():
+            if path in references:
+                report.referenced += 1
+                continue
+            try:
+                st = os.stat(path)
+                if st.st_mtime > cutoff:
+                    report.kept_recent += 1
+                    continue
+                if not dry_run:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+            report.files_removed += 1
+            report.bytes_freed += st.st_size
+            report.removed.append(path)
+        if not dry_run:
+            self._remove_empty_dirs()
+        return report
+
+    def _remove_empty_dirs(self) -> None:
+        root = books_root(self.output_dir)
+        if not os.path.isdir(root):
+            return
+        for entry in os.scandir(root):
+            if entry.is_dir():
+                try:
+                    os.rmdir(entry.path)
+                except OSError:
+                    pass  # not empty
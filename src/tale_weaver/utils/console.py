@@ -0,0 +1,17 @@
+import sys
+import threading
+
+_lock = threading.Lock()
+
+
+def print_line(message: str) -> None:
+    """
+    Print `message` as one complete line.
+
+    `print` writes the text and the newline separately, so messages printed by
+    several illustration workers at once end up on the same line. This writes
+    both in a single call, serialized across threads.
+    """
+    with _lock:
+        sys.stdout.write(f"{message}\n")
+        sys.stdout.flush()
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Union
+
+
+def cache_root() -> str:
+    """
+    Return the base directory for on-disk caches.
+
+    `CACHE_DIR` wins when set, otherwise caches live in `OUTPUT_DIR/.cache`.
+    """
+    return os.getenv("CACHE_DIR") or os.path.join(os.getenv("OUTPUT_DIR") or "./", ".cache")
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean flag (1/true/yes/on) from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def hash_parts(parts: Iterable[Union[str, bytes]]) -> str:
+    """
+    Hash an ordered sequence of str/bytes values into a hex digest.
+
+    Each part is length-prefixed so that ("ab", "c") and ("a", "bc") differ.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class DiskLRUCache:
+    """
+    A thread-safe, content-addressed file cache with LRU eviction.
+
+    Entries are stored as `<key><suffix>` files inside `directory`, so the cache
+    survives process restarts: the index is rebuilt from the files' modification
+    times on startup and a hit refreshes the entry's modification time.
+
+    Args:
+        directory: Where entries are stored (created if missing).
+        suffix: File extension appended to every key.
+        suffixes: Other extensions an entry may be stored with (see `put`).
+        max_bytes: Total size budget; least recently used entries are evicted above it.
+        max_entries: Maximum number of entries (None means unbounded).
+        max_age: Entries not used for more than this many seconds are dropped.
+    """
+
+    def __init__(self, directory: str, suffix: str = "", max_bytes: Optional[int] = None,
+                 max_entries: Optional[int] = None, max_age: Optional[float] = None,
+                 suffixes: Iterable[str] = ()):
+        self.directory = directory
+        self.suffix = suffix
+        self.suffixes = tuple(dict.fromkeys((suffix, *suffixes)))
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._index: "OrderedDict[str, tuple]" = OrderedDict()
+        # Extension of the entries not stored with the default suffix
+        self._entry_suffix: Dict[str, str] = {}
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self._entry_suffix.get(key, self.suffix)}")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the path of the cached entry for `key`, or None on miss.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            path = self.path_for(key)
+            if entry is not None and self.max_age is not None and time.time() - entry[1] > self.max_age:
+                self._remove(key)
+                entry = None
+            if entry is None or not os.path.exists(path):
+                if entry is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+            now = time.time()
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+            self._index[key] = (entry[0], now)
+            self._index.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def put(self, key: str, source: Union[str, bytes], move: bool = False, suffix: Optional[str] = None) -> str:
+        """
+        Store a file (by path) or raw bytes under `key` and return the cached path.
+
+        Args:
+            key: Cache key.
+            source: Path of the file to store, or its content as bytes.
+            move: Move the source file into the cache instead of copying it.
+            suffix: Extension of the stored file, one of `suffixes`; defaults to `suffix`.
+        """
+        suffix = self.suffix if suffix is None else suffix
+        if suffix not in self.suffixes:
+            raise ValueError(f"Unsupported cache entry suffix '{suffix}' (expected one of {self.suffixes})")
+        path = os.path.join(self.directory, f"{key}{suffix}")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            if isinstance(source, (bytes, bytearray)):
+                with os.fdopen(fd, "wb") as f:
+                    f.write(source)
+            else:
+                os.close(fd)
+                if move:
+                    shutil.move(source, tmp_path)
+                else:
+                    shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            previous = self.path_for(key)
+            self._forget(key)
+            if previous != path:
+                # Stored before with another extension
+                try:
+                    os.remove(previous)
+                except OSError:
+                    pass
+            if suffix != self.suffix:
+                self._entry_suffix[key] = suffix
+            size = os.path.getsize(path)
+            self._index[key] = (size, time.time())
+            self._total_bytes += size
+            self._evict()
+        return path
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def _load_index(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            # Longest match first, so that "" never shadows a real extension
+            suffix = next((s for s in sorted(self.suffixes, key=len, reverse=True) if name.endswith(s)), None)
+            if suffix is None:
+                continue
+            full = os.path.join(self.directory, name)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            key = name[:len(name) - len(suffix)] if suffix else name
+            entries.append((st.st_mtime, key, st.st_size, suffix))
+        for mtime, key, size, suffix in sorted(entries):
+            if key in self._index:
+                # Same entry under two extensions: keep the most recent one
+                self._remove(key)
+            if suffix != self.suffix:
+                self._entry_suffix[key] = suffix
+            self._index[key] = (size, mtime)
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        # Caller must hold the lock
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            for key in [k for k, (_, used) in self._index.items() if used < cutoff]:
+                self._remove(key)
+        while self._index and (
+            (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+            or (self.max_entries is not None and len(self._index) > self.max_entries)
+        ):
+            self._remove(next(iter(self._index)))
+
+    def _forget(self, key: str) -> None:
+        entry = self._index.pop(key, None)
+        self._entry_suffix.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[0]
+
+    def _remove(self, key: str) -> None:
+        path = self.path_for(key)
+        self._forget(key)
+        self.evictions += 1
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,12 @@
+from functools import lru_cache
+
+from dotenv import find_dotenv, load_dotenv
+
+
+@lru_cache(maxsize=1)
+def load_env() -> bool:
+    """
+    Read `.env` into the environment once per process, on first use rather than at import.
+    The file is looked up from the package directory upwards, then from the working directory.
+    """
+    return load_dotenv() or load_dotenv(find_dotenv(usecwd=True))
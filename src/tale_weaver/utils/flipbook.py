@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+from tale_weaver.utils.disk_cache import DiskLRUCache
+
+# Resolves an image path to the value of an <img src> (URL or data URI); None if unavailable
+ImageSource = Callable[[str], Optional[str]]
+# Formats of the display derivatives, which browsers show as-is
+_DISPLAY_EXTENSIONS = {"WEBP": ".webp", "JPEG": ".jpg", "PNG": ".png"}
+
+
+def _display_format(name: str) -> Optional[str]:
+    """Pillow name of a display format given in any case ("jpg" is JPEG); None if unsupported or not writable."""
+    name = (name or "").strip().upper()
+    name = "JPEG" if name == "JPG" else name
+    Image.init()
+    return name if name in _DISPLAY_EXTENSIONS and name in Image.SAVE else None
+
+
+def to_data_uri(img_path: str):
+    if not img_path:
+        return None
+    p = Path(img_path)
+    if not p.exists():
+        return None
+    ext = p.suffix.lower().replace(".", "")
+    if ext not in {"png","jpg","jpeg","webp","gif"}:
+        ext = "png"
+    try:
+        with open(p, "rb") as f:
+            b64 = base64.b64encode(f.read()).decode("utf-8")
+            return f"data:image/{ext};base64,{b64}"
+    except Exception:
+        return None
+
+def build_pages(data: dict):
+    pages = []
+    pages.append({"kind":"cover", "image": data.get("storybook_image_path"), "title": data.get("storybook_title", "")})
+    for pg in data.get("pages", []):
+        pages.append({"kind":"image", "image": pg.get("scene_image_path"), "n": pg.get("page_number")})
+        pages.append({"kind":"text",  "text": pg.get("scene_text",""), "n": pg.get("page_number")})
+    return pages
+
+def image_page_html(img_path: str, cover=False, src: Optional[ImageSource] = None):
+    uri = (src or to_data_uri)(img_path)
+    if uri is None:
+        body = f'<div style="display:flex;height:100%;align-items:center;justify-content:center;opacity:.7;padding:24px;text-align:center;">Immagine non trovata<br><small>{escape(str(img_path) or "")}</small></div>'
+    else:
+        body = f'<img src="{uri}" alt="">'
+    if cover:
+        return f'<div class="page cover">{body}</div>'
+    else:
+        return f'<div class="page image">{body}</div>'
+
+def text_page_html(text: str, page_num: int):
+    safe = escape(text or "").replace("\n\n", "</p><p>").replace("\n", "<br>")
+    return f'<div class="page text"><div class="content"><p>{safe}</p></div><div class="num">{page_num}</div></div>'
+
+def page_to_html(pobj, idx, src: Optional[ImageSource] = None):
+    if pobj["kind"] in {"cover","image"}:
+        return image_page_html(pobj.get("image"), cover=(pobj["kind"]=="cover"), src=src)
+    else:
+        return text_page_html(pobj.get("text",""), idx)
+
+def spread_indices(total: int, current_page: int) -> Tuple[Optional[int], Optional[int]]:
+    """Return the 1-based (left, right) page indexes shown for `current_page`; the cover is shown alone."""
+    if current_page == 1:
+        return 1, None
+    left_idx  = current_page if current_page % 2 == 0 else current_page - 1
+    if left_idx > total:
+        return None, None
+    right_idx = left_idx + 1 if left_idx + 1 <= total else None
+    return left_idx, right_idx
+
+def spread_image_paths(pages, current_page: int) -> List[str]:
+    """Image paths displayed by the spread of `current_page` (empty past the end)."""
+    return [pages[i - 1].get("image") for i in spread_indices(len(pages), current_page)
+            if i and pages[i - 1].get("image")]
+
+def spread_html(pages, current_page: int, src: Optional[ImageSource] = None) -> str:
+    """Build the HTML of the spread shown for `current_page` (1 is the cover)."""
+    if current_page == 1:
+        return image_page_html(pages[0].get("image"), cover=True, src=src)
+
+    left_idx, right_idx = spread_indices(len(pages), current_page)
+    left_html  = page_to_html(pages[left_idx - 1],  left_idx, src=src)
+    right_html = page_to_html(pages[right_idx - 1], int(left_idx/2), src=src) if right_idx else ""
+    return f'<div class="flip">{left_html}{right_html}</div>'
+
+
+class DisplayAssets:
+    """
+    Display-size derivatives (WebP or JPEG) of the book illustrations for the flipbook.
+
+    Each source image is downscaled to fit `max_size` and re-encoded once; derivatives
+    are stored in `directory` keyed by source path, modification time, size and
+    encoding settings, so the viewer never re-encodes full-resolution PNGs on reruns.
+
+    Args:
+        directory: Where derivatives are written (e.g. Streamlit's `static/` folder).
+        max_size: Maximum (width, height) in pixels.
+        image_format: "WEBP", "JPEG" (or "JPG") or "PNG", in any case.
+        quality: Encoder quality.
+        max_bytes: Size budget of the derivatives directory.
+    """
+
+    def __init__(self, directory: str, max_size: Tuple[int, int] = (840, 1140), image_format: str = "WEBP",
+                 quality: int = 80, max_bytes: Optional[int] = None):
+        self.max_size = tuple(max_size)
+        self.image_format = _display_format(image_format)
+        if self.image_format is None:
+            raise ValueError(f"Unsupported flipbook image format: {image_format}")
+        self.quality = quality
+        self.extension = _DISPLAY_EXTENSIONS[self.image_format]
+        self._cache = DiskLRUCache(directory, suffix=self.extension, max_bytes=max_bytes)
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="flipbook-assets")
+
+    @classmethod
+    def from_env(cls, directory: str) -> "DisplayAssets":
+        """Settings from FLIPBOOK_IMAGE_MAX (WxH), FLIPBOOK_IMAGE_FORMAT, FLIPBOOK_IMAGE_QUALITY, FLIPBOOK_CACHE_MAX_MB."""
+        w, h = (int(v) for v in os.getenv("FLIPBOOK_IMAGE_MAX", "840x1140").lower().split("x"))
+        image_format = os.getenv("FLIPBOOK_IMAGE_FORMAT", "WEBP")
+        if _display_format(image_format) is None:
+            print(f"FLIPBOOK_IMAGE_FORMAT={image_format} is not supported (WEBP, JPEG or PNG): using WEBP.")
+            image_format = "WEBP"
+        return cls(directory, max_size=(w, h),
+                   image_format=image_format,
+                   quality=int(os.getenv("FLIPBOOK_IMAGE_QUALITY", "80")),
+                   max_bytes=int(float(os.getenv("FLIPBOOK_CACHE_MAX_MB", "256")) * 1024 * 1024))
+
+    def derivative(self, img_path: str) -> Optional[str]:
+        """Return the path of the display derivative of `img_path`, creating it if needed."""
+        if not img_path or not os.path.exists(img_path):
+            return None
+        st = os.stat(img_path)
+        key_src = f"{os.path.abspath(img_path)}|{st.st_mtime_ns}|{st.st_size}|{self.max_size}|{self.image_format}|{self.quality}"
+        key = hashlib.sha1(key_src.encode("utf-8")).hexdigest()
+        cached = self._cache.get(key)
+        if cached:
+            return cached
+        try:
+            with Image.open(img_path) as img:
+                img = img.convert("RGB")
+                img.thumbnail(self.max_size, Image.Resampling.LANCZOS)
+                fd, tmp_path = tempfile.mkstemp(dir=self._cache.directory, suffix=".part")
+                with os.fdopen(fd, "wb") as f:
+                    img.save(f, self.image_format, quality=self.quality)
+        except Exception:
+            return None
+        return self._cache.put(key, tmp_path, move=True)
+
+    def build_book(self, data: dict) -> None:
+        """Create the derivatives of every illustration of the storybook."""
+        list(self._executor.map(self.derivative, [p.get("image") for p in build_pages(data) if p.get("image")]))
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        """Create derivatives in the background, e.g. for the next spread."""
+        for path in paths:
+            self._executor.submit(self.derivative, path)
@@ -0,0 +1,58 @@
+import os
+import threading
+from typing import List, Optional
+
+from tale_weaver.utils.disk_cache import DiskLRUCache, cache_root, env_flag, hash_parts
+
+_cache: Optional[DiskLRUCache] = None
+_cache_lock = threading.Lock()
+
+
+def image_cache_enabled() -> bool:
+    """False when `IMAGE_CACHE_BYPASS` is set: every image is generated from scratch."""
+    return not env_flag("IMAGE_CACHE_BYPASS")
+
+
+def get_image_cache() -> DiskLRUCache:
+    """
+    Return the process-wide cache of generated illustrations. Entries keep the
+    extension of their format (PNG, JPEG or WebP).
+
+    Configured through:
+        IMAGE_CACHE_DIR: cache directory (default `<cache root>/images`).
+        IMAGE_CACHE_MAX_MB: size budget in megabytes (default 1024).
+        IMAGE_CACHE_MAX_AGE_DAYS: entries unused for longer are evicted (default 30).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskLRUCache(
+                directory=os.getenv("IMAGE_CACHE_DIR") or os.path.join(cache_root(), "images"),
+                suffix=".png",
+                suffixes=(".jpg", ".webp"),
+                max_bytes=int(float(os.getenv("IMAGE_CACHE_MAX_MB", "1024")) * 1024 * 1024),
+                max_age=float(os.getenv("IMAGE_CACHE_MAX_AGE_DAYS", "30")) * 86400,
+            )
+        return _cache
+
+
+def image_cache_key(model: str, prompt: str, reference_paths: Optional[List[str]] = None,
+                    output: str = "") -> str:
+    """
+    Build the cache key of a generation request.
+
+    Args:
+        model: Image model name.
+        prompt: Text prompt.
+        reference_paths: Reference images sent along with the prompt; their bytes,
+            not their names, take part in the key.
+        output: Output settings of the stored image (see `ImageWriter.signature`).
+
+    Returns:
+        str: Hex digest identifying the request.
+    """
+    parts = [model or "", prompt, output]
+    for path in reference_paths or []:
+        with open(path, "rb") as f:
+            parts.append(f.read())
+    return hash_parts(parts)
@@ -0,0 +1,153 @@
+import io
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from PIL import Image
+
+_EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+_SIGNATURES = {b"\x89PNG\r\n\x1a\n": "PNG", b"\xff\xd8\xff": "JPEG"}
+# Modes every consumer (montages, PDF export, flipbook) handles as-is
+_DIRECT_MODES = {"RGB", "L"}
+
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """Return "PNG", "JPEG" or "WEBP" from the leading bytes of an encoded image, None otherwise."""
+    for signature, image_format in _SIGNATURES.items():
+        if data.startswith(signature):
+            return image_format
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+def output_suffix(image_suffix: str, image_format: Optional[str]) -> str:
+    """Replace the extension of `image_suffix` with the one of `image_format` (PNG when unknown)."""
+    return os.path.splitext(image_suffix)[0] + _EXTENSIONS.get(image_format or "PNG", ".png")
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        alpha = image.getchannel("A")
+        if alpha.getextrema()[0] == 255:
+            # Fully opaque: no need for a full-size composite
+            return image.convert("RGB")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=alpha)
+        return background
+    return image if image.mode in _DIRECT_MODES else image.convert("RGB")
+
+
+class ImageWriter:
+    """
+    Persists the images returned by the image model.
+
+    When the returned bytes are already PNG or JPEG in an RGB/L mode and the requested
+    format accepts them, they are written as-is: only the header is parsed, nothing is
+    decoded or re-encoded. Otherwise the image is decoded, flattened on white if it
+    has transparency, and encoded by the calling thread, which waits for the result.
+    At most `workers` encodes run at once: when many images finish together, the
+    others wait instead of competing for the CPU. This is a cap, not an offload.
+
+    Args:
+        image_format: "SOURCE" (keep PNG/JPEG as returned, other formats become PNG),
+            "PNG", "JPEG" or "WEBP".
+        quality: JPEG/WebP quality.
+        png_compress_level: zlib level of PNG encodes (0-9; 1 is fast, 6 is Pillow's default).
+        workers: Maximum number of encodes running at once.
+    """
+
+    def __init__(self, image_format: str = "SOURCE", quality: int = 90, png_compress_level: int = 1,
+                 workers: Optional[int] = None):
+        self.image_format = image_format.upper().replace("JPG", "JPEG")
+        if self.image_format != "SOURCE" and self.image_format not in _EXTENSIONS:
+            raise ValueError(f"Unsupported image output format: {image_format}")
+        self.quality = quality
+        self.png_compress_level = png_compress_level
+        self._encoding = threading.BoundedSemaphore(workers or min(4, os.cpu_count() or 1))
+        self._lock = threading.Lock()
+        self.direct_writes = 0
+        self.encodes = 0
+
+    @classmethod
+    def from_env(cls) -> "ImageWriter":
+        workers = os.getenv("IMAGE_ENCODE_WORKERS")
+        return cls(image_format=os.getenv("IMAGE_OUTPUT_FORMAT", "SOURCE"),
+                   quality=int(os.getenv("IMAGE_OUTPUT_QUALITY", "90")),
+                   png_compress_level=int(os.getenv("IMAGE_PNG_COMPRESS_LEVEL", "1")),
+                   workers=int(workers) if workers else None)
+
+    @property
+    def signature(self) -> str:
+        """Identifies the output settings, e.g. to keep cached images of other formats apart."""
+        if self.image_format == "SOURCE":
+            return "SOURCE"
+        return f"{self.image_format}:{self.quality}:{self.png_compress_level}"
+
+    def _target(self, source_format: Optional[str], mode: str) -> Optional[str]:
+        """Format to encode to, or None when the source bytes can be written directly."""
+        if self.image_format == "SOURCE":
+            return None if source_format in ("PNG", "JPEG") and mode in _DIRECT_MODES else "PNG"
+        return None if source_format == self.image_format and mode in _DIRECT_MODES else self.image_format
+
+    def write(self, img_data: bytes, image_suffix: str, directory: Optional[str] = None) -> str:
+        """
+        Save an encoded image to a new file in `directory`.
+
+        Args:
+            img_data: Encoded image returned by the model.
+            image_suffix: File name suffix (e.g. "_scene_3.png"); its extension is
+                replaced by the one of the written format.
+            directory: Destination directory (default: the system temp directory).
+
+        Returns:
+            str: Path of the written file.
+        """
+        source_format = sniff_format(img_data)
+        with Image.open(io.BytesIO(img_data)) as image:
+            # Image.open only parses the header: the mode is known without decoding
+            target = self._target(source_format, image.mode)
+        if target is None:
+            fd, path = tempfile.mkstemp(suffix=output_suffix(image_suffix, source_format), dir=directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(img_data)
+            with self._lock:
+                self.direct_writes += 1
+            return path
+        with self._encoding:
+            return self._encode(img_data, target, image_suffix, directory)
+
+    def _encode(self, img_data: bytes, target: str, image_suffix: str, directory: Optional[str]) -> str:
+        image = _to_rgb(Image.open(io.BytesIO(img_data)))
+        fd, path = tempfile.mkstemp(suffix=output_suffix(image_suffix, target), dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            if target == "PNG":
+                image.save(f, "PNG", compress_level=self.png_compress_level)
+            else:
+                image.save(f, target, quality=self.quality)
+        with self._lock:
+            self.encodes += 1
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"direct_writes": self.direct_writes, "encodes": self.encodes}
+
+
+_writer: Optional[ImageWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_image_writer() -> ImageWriter:
+    """
+    Return the process-wide image writer, configured through IMAGE_OUTPUT_FORMAT
+    (source, png, jpeg, webp), IMAGE_OUTPUT_QUALITY, IMAGE_PNG_COMPRESS_LEVEL and
+    IMAGE_ENCODE_WORKERS.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ImageWriter.from_env()
+        return _writer
@@ -0,0 +1,126 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+# (path, value) of a JSON value completed by the last `feed`; path items are object
+# keys (str) and array indexes (int), e.g. ("characters", "Ash") or ("pages", 0)
+CompletedValue = Tuple[Tuple[Any, ...], Any]
+
+
+class _Frame:
+    __slots__ = ("is_object", "start", "key", "expect_key", "index", "scalar_start")
+
+    def __init__(self, is_object: bool, start: int):
+        self.is_object = is_object
+        self.start = start
+        self.key: Optional[str] = None
+        self.expect_key = is_object
+        self.index = 0
+        self.scalar_start: Optional[int] = None
+
+    def path_item(self):
+        return self.key if self.is_object else self.index
+
+
+class IncrementalJSONParser:
+    """
+    Parse a JSON object while its text is still being streamed, reporting every value
+    as soon as it is complete.
+
+    Text before the first "{" (e.g. an agent's "Thought: ... Final Answer:" preamble or
+    a code fence) is skipped. Only values up to `max_depth` levels deep are reported,
+    so a storybook stream yields its title and prompt, then each character and each
+    page as soon as its closing brace arrives, without re-parsing the whole buffer.
+
+    Example:
+        parser = IncrementalJSONParser(max_depth=2)
+        for chunk in chunks:
+            for path, value in parser.feed(chunk):
+                if path[:1] == ("pages",) and len(path) == 2:
+                    illustrate(value)
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self.done = False
+
+    def feed(self, chunk: str) -> List[CompletedValue]:
+        """Add streamed text; return the values it completed, in document order."""
+        if self.done or not chunk:
+            return []
+        self._text += chunk
+        completed: List[CompletedValue] = []
+        text = self._text
+        i = self._pos
+        while i < len(text) and not self.done:
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._string_end(self._string_start, i, completed)
+            elif not self._started:
+                if c == "{":
+                    self._started = True
+                    self._stack.append(_Frame(True, i))
+            elif c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                self._stack.append(_Frame(c == "{", i))
+            elif c in "}]":
+                self._end_scalar(i, completed)
+                frame = self._stack.pop()
+                self._complete(frame.start, i + 1, completed)
+                if not self._stack:
+                    self.done = True
+            elif c == ":":
+                self._stack[-1].expect_key = False
+            elif c == ",":
+                self._end_scalar(i, completed)
+                top = self._stack[-1]
+                if top.is_object:
+                    top.expect_key = True
+                else:
+                    top.index += 1
+            elif not c.isspace() and self._stack[-1].scalar_start is None and not self._stack[-1].expect_key:
+                # Start of a number, true, false or null
+                self._stack[-1].scalar_start = i
+            i += 1
+        self._pos = i
+        return completed
+
+    def _path(self) -> Tuple[Any, ...]:
+        # Path of the value currently being written in the innermost container
+        return tuple(frame.path_item() for frame in self._stack)
+
+    def _string_end(self, start: int, end: int, completed: List[CompletedValue]) -> None:
+        top = self._stack[-1]
+        value = json.loads(self._text[start:end + 1])
+        if top.is_object and top.expect_key:
+            top.key = value
+        elif len(self._stack) <= self.max_depth:
+            completed.append((self._path(), value))
+
+    def _end_scalar(self, end: int, completed: List[CompletedValue]) -> None:
+        top = self._stack[-1]
+        if top.scalar_start is None:
+            return
+        raw = self._text[top.scalar_start:end].strip()
+        top.scalar_start = None
+        if raw and len(self._stack) <= self.max_depth:
+            completed.append((self._path(), json.loads(raw)))
+
+    def _complete(self, start: int, end: int, completed: List[CompletedValue]) -> None:
+        # The container just popped is the value at the current path of its parent
+        if self._stack and len(self._stack) <= self.max_depth:
+            completed.append((self._path(), json.loads(self._text[start:end])))
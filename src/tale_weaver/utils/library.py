@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from PIL import Image
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    json_path TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    language TEXT,
+    page_count INTEGER NOT NULL,
+    created REAL NOT NULL,
+    json_mtime REAL NOT NULL,
+    pdf_path TEXT,
+    cover_path TEXT,
+    thumbnail_path TEXT,
+    asset_paths TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_created ON books (created DESC);
+CREATE INDEX IF NOT EXISTS books_title ON books (title COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS ignored_files (
+    json_path TEXT PRIMARY KEY,
+    json_mtime REAL NOT NULL
+);
+"""
+
+_COLUMNS = ("json_path", "title", "language", "page_count", "created", "pdf_path", "cover_path", "thumbnail_path")
+
+
+class StorybookLibrary:
+    """
+    SQLite index of the generated storybooks: title, language, page count, creation
+    time, cover thumbnail and asset paths.
+
+    Listing and searching the library only queries the index; the full storybook JSON
+    is read when a book is opened (`load`). Books are indexed by `save_storybook` when
+    they are written, and `sync` indexes the JSON files written before the index
+    existed (or by other tools), parsing only new or modified files.
+
+    Args:
+        db_path: SQLite database file.
+        thumbnail_dir: Where cover thumbnails are written.
+        thumbnail_size: Maximum (width, height) of the thumbnails.
+    """
+
+    def __init__(self, db_path: str, thumbnail_dir: Optional[str] = None, thumbnail_size=(160, 220)):
+        self.db_path = db_path
+        self.thumbnail_dir = thumbnail_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), "thumbnails")
+        self.thumbnail_size = tuple(thumbnail_size)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation: callers come from many threads
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add(self, json_data: dict, json_path: str, pdf_path: Optional[str] = None,
+            language: Optional[str] = None) -> None:
+        """
+        Index (or re-index) a storybook.
+
+        Args:
+            json_data: The storybook as a dict (see `Storybook`).
+            json_path: Where its JSON is stored; identifies the book.
+            pdf_path: Its PDF export, if any.
+            language: Language it was written in, when known.
+        """
+        json_path = os.path.abspath(json_path)
+        cover_path = json_data.get("storybook_image_path") or None
+        assets = [cover_path] + [c.get("character_image_path") for c in json_data.get("characters", {}).values()] \
+            + [p.get("scene_image_path") for p in json_data.get("pages", [])]
+        mtime = os.path.getmtime(json_path) if os.path.exists(json_path) else time.time()
+        thumbnail_path = self._thumbnail(json_path, cover_path)
+        with self._connect() as db:
+            row = db.execute("SELECT created, language FROM books WHERE json_path = ?", (json_path,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO books (json_path, title, language, page_count, created, json_mtime, pdf_path, "
+                "cover_path, thumbnail_path, asset_paths) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (json_path, json_data.get("storybook_title", ""), language or (row["language"] if row else None),
+                 len(json_data.get("pages", [])), row["created"] if row else mtime, mtime,
+                 pdf_path and os.path.abspath(pdf_path), cover_path, thumbnail_path,
+                 json.dumps([a for a in assets if a])))
+            db.execute("DELETE FROM ignored_files WHERE json_path = ?", (json_path,))
+
+    def _thumbnail(self, json_path: str, cover_path: Optional[str]) -> Optional[str]:
+        if not cover_path or not os.path.exists(cover_path):
+            return None
+        os.makedirs(self.thumbnail_dir, exist_ok=True)
+        thumbnail_path = os.path.join(self.thumbnail_dir,
+                                      f"{hashlib.sha1(json_path.encode('utf-8')).hexdigest()[:16]}.jpg")
+        try:
+            with Image.open(cover_path) as img:
+                img = img.convert("RGB")
+                img.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
+                img.save(thumbnail_path, "JPEG", quality=80)
+        except Exception as e:
+            print(f"Library: could not create the thumbnail of {cover_path}: {e}")
+            return None
+        return thumbnail_path
+
+    def sync(self, output_dir: str) -> int:
+        """
+        Index the storybook JSON files of `output_dir` that are new or changed since
+        they were last indexed, and forget the books whose JSON was deleted.
+
+        Returns:
+            int: Number of books (re-)indexed.
+        """
+        with self._connect() as db:
+            known = {r["json_path"]: r["json_mtime"] for r in db.execute("SELECT json_path, json_mtime FROM books")}
+            ignored = {r["json_path"]: r["json_mtime"] for r in
+                       db.execute("SELECT json_path, json_mtime FROM ignored_files")}
+        seen = set()
+        indexed = 0
+        if not os.path.isdir(output_dir):
+            return 0
+        for entry in os.scandir(output_dir):
+            if not entry.is_file() or not entry.name.endswith(".json"):
+                continue
+            json_path = os.path.abspath(entry.path)
+            mtime = entry.stat().st_mtime
+            seen.add(json_path)
+            if known.get(json_path) == mtime or ignored.get(json_path) == mtime:
+                continue
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                is_storybook = isinstance(data, dict) and "storybook_title" in data and "pages" in data
+            except Exception:
+                is_storybook = False
+            if not is_storybook:
+                # Batch status files and the like: remember them so they are not parsed again
+                with self._connect() as db:
+                    db.execute("INSERT OR REPLACE INTO ignored_files (json_path, json_mtime) VALUES (?, ?)",
+                               (json_path, mtime))
+                continue
+            pdf_path = os.path.splitext(json_path)[0] + ".pdf"
+            self.add(data, json_path, pdf_path if os.path.exists(pdf_path) else None)
+            indexed += 1
+        output_dir = os.path.abspath(output_dir)
+        removed = [p for p in known if os.path.dirname(p) == output_dir and p not in seen]
+        if removed:
+            with self._connect() as db:
+                db.executemany("DELETE FROM books WHERE json_path = ?", [(p,) for p in removed])
+        return indexed
+
+    @staticmethod
+    def _where(query: str):
+        if not query:
+            return "", ()
+        return " WHERE title LIKE ? COLLATE NOCASE OR language LIKE ? COLLATE NOCASE", (f"%{query}%", f"%{query}%")
+
+    def search(self, query: str = "", limit: int = 20, offset: int = 0) -> List[Dict]:
+        """
+        List the books whose title (or language) contains `query`, newest first.
+
+        Returns:
+            List[Dict]: Index rows (json_path, title, language, page_count, created,
+            pdf_path, cover_path, thumbnail_path); the storybook itself is not loaded.
+        """
+        where, params = self._where(query)
+        with self._connect() as db:
+            rows = db.execute(f"SELECT {', '.join(_COLUMNS)} FROM books{where} ORDER BY created DESC LIMIT ? OFFSET ?",
+                              (*params, limit, offset)).fetchall()
+        return [dict(r) for r in rows]
+
+    def count(self, query: str = "") -> int:
+        where, params = self._where(query)
+        with self._connect() as db:
+            return db.execute(f"SELECT COUNT(*) FROM books{where}", params).fetchone()[0]
+
+    def asset_paths(self, json_path: str) -> List[str]:
+        with self._connect() as db:
+            row = db.execute("SELECT asset_paths FROM books WHERE json_path = ?",
+                             (os.path.abspath(json_path),)).fetchone()
+        return json.loads(row["asset_paths"]) if row else []
+
+    def asset_references(self) -> Dict[str, List[str]]:
+        """Files used by every indexed book (illustrations and thumbnail), by JSON path."""
+        with self._connect() as db:
+            rows = db.execute("SELECT json_path, thumbnail_path, asset_paths FROM books").fetchall()
+        return {r["json_path"]: json.loads(r["asset_paths"]) + ([r["thumbnail_path"]] if r["thumbnail_path"] else [])
+                for r in rows}
+
+    @staticmethod
+    def load(json_path: str) -> dict:
+        """Read the full storybook JSON of an indexed book."""
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+_libraries: Dict[str, StorybookLibrary] = {}
+_libraries_lock = threading.Lock()
+
+
+def get_library(output_dir: Optional[str] = None) -> StorybookLibrary:
+    """
+    Return the library index of `output_dir` (default `OUTPUT_DIR`), stored in
+    `LIBRARY_DB` when set, otherwise in `<cache root>/library.sqlite3`.
+    """
+    output_dir = output_dir or os.getenv("OUTPUT_DIR") or "./"
+    db_path = os.getenv("LIBRARY_DB") or os.path.join(
+        os.getenv("CACHE_DIR") or os.path.join(output_dir, ".cache"), "library.sqlite3")
+    db_path = os.path.abspath(db_path)
+    with _libraries_lock:
+        if db_path not in _libraries:
+            _libraries[db_path] = StorybookLibrary(db_path)
+        return _libraries[db_path]
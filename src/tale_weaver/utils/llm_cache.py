@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+from typing import Any, Optional
+
+from crewai import LLM
+
+from tale_weaver.utils import tracing
+from tale_weaver.utils.disk_cache import DiskLRUCache, cache_root, env_flag, hash_parts
+from tale_weaver.utils.llm_stream import publish_chunk
+
+_cache: Optional[DiskLRUCache] = None
+_cache_lock = threading.Lock()
+
+
+def llm_cache_enabled() -> bool:
+    """True when `LLM_CACHE` is set: identical LLM requests are answered from disk."""
+    return env_flag("LLM_CACHE")
+
+
+def get_llm_cache() -> DiskLRUCache:
+    """
+    Return the process-wide cache of LLM completions.
+
+    Configured through:
+        LLM_CACHE_DIR: cache directory (default `<cache root>/llm`).
+        LLM_CACHE_MAX_MB: size budget in megabytes (default 256).
+        LLM_CACHE_TTL_HOURS: completions older than this are evicted (default 168).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskLRUCache(
+                directory=os.getenv("LLM_CACHE_DIR") or os.path.join(cache_root(), "llm"),
+                suffix=".json",
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+                max_age=float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600,
+            )
+        return _cache
+
+
+class CachedLLM(LLM):
+    """
+    An LLM whose plain-text completions are cached on disk, keyed by model,
+    temperature, seed and the rendered messages.
+
+    Only meant for agents without tools. Calls passing native `tools` or
+    `available_functions` bypass the cache, but crewai's ReAct agents describe their
+    tools in the prompt text instead, so their turns look like plain completions and
+    a hit would replay a stale tool Observation: crew.py gives the tool-using
+    illustrator an uncached LLM. On a hit with `stream=True`, the cached text is
+    delivered to the `stream_chunks` listener as a single chunk.
+
+    Args:
+        model: Model name, as for `LLM`.
+        cache: Cache to use; defaults to `get_llm_cache()`.
+        **kwargs: Any other `LLM` argument (temperature, seed, stream...).
+    """
+
+    def __init__(self, model: str, cache: Optional[DiskLRUCache] = None, **kwargs):
+        super().__init__(model, **kwargs)
+        self._response_cache = cache or get_llm_cache()
+
+    def cache_key(self, messages: Any) -> str:
+        return hash_parts([self.model, repr(self.temperature), repr(self.seed),
+                           json.dumps(messages, sort_keys=True, ensure_ascii=False, default=str)])
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        if tools or available_functions:
+            return super().call(messages, tools=tools, callbacks=callbacks,
+                                available_functions=available_functions, **kwargs)
+
+        key = self.cache_key(messages)
+        cached_path = self._response_cache.get(key)
+        if cached_path:
+            with tracing.span("llm.cache_hit", model=self.model):
+                with open(cached_path, "r", encoding="utf-8") as f:
+                    response = json.load(f)["response"]
+            if self.stream:
+                publish_chunk(self, response)
+            return response
+
+        response = super().call(messages, tools=tools, callbacks=callbacks,
+                                available_functions=available_functions, **kwargs)
+        if isinstance(response, str) and response:
+            data = {"model": self.model, "response": response}
+            self._response_cache.put(key, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        return response
+
+
+def report_llm_cache() -> None:
+    """Print the LLM cache hit rate, when the cache is enabled."""
+    if llm_cache_enabled():
+        stats = get_llm_cache().stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"(hit rate {stats['hit_rate']:.0%}), {stats['entries']} entries")
@@ -0,0 +1,48 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+try:
+    from crewai.utilities.events import crewai_event_bus
+    from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+except ImportError:  # crewai moved the event bus to crewai.events
+    from crewai.events import LLMStreamChunkEvent, crewai_event_bus
+
+_listeners: Dict[int, Callable[[str], None]] = {}
+_listeners_lock = threading.Lock()
+_registered = False
+
+
+def _on_chunk(source, event) -> None:
+    listener = _listeners.get(id(source))
+    if listener is not None:
+        listener(event.chunk)
+
+
+@contextmanager
+def stream_chunks(llm, callback: Callable[[str], None]) -> Iterator[None]:
+    """
+    Call `callback` with every text chunk streamed by `llm` (created with `stream=True`)
+    while the block runs.
+
+    A single handler is registered on the crewai event bus for the whole process and
+    routes chunks by emitting LLM, so concurrent crews each see only their own stream.
+    """
+    global _registered
+    with _listeners_lock:
+        if not _registered:
+            crewai_event_bus.on(LLMStreamChunkEvent)(_on_chunk)
+            _registered = True
+        _listeners[id(llm)] = callback
+    try:
+        yield
+    finally:
+        with _listeners_lock:
+            _listeners.pop(id(llm), None)
+
+
+def publish_chunk(llm, chunk: str) -> None:
+    """Deliver text to the `stream_chunks` listener of `llm` as if it had been streamed."""
+    listener = _listeners.get(id(llm))
+    if listener is not None:
+        listener(chunk)
@@ -0,0 +1,127 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from tale_weaver.model.storybook import Storybook
+from tale_weaver.utils.disk_cache import hash_parts
+
+
+def book_id(title: str) -> str:
+    """File-system friendly identifier of a storybook, derived from its book key or title."""
+    return re.sub(r"[^\w-]+", "_", title or "").strip("_") or "storybook"
+
+
+def manifest_path_for(storybook: Storybook, output_dir: Optional[str] = None,
+                      book_key: Optional[str] = None) -> str:
+    """
+    Default manifest location: `<output_dir>/manifests/<book id>.json`.
+
+    Args:
+        storybook: The storybook.
+        output_dir: Defaults to `OUTPUT_DIR`.
+        book_key: Identity of the book (a batch item or job id); defaults to its title,
+            which two books may share.
+    """
+    output_dir = output_dir or os.getenv("OUTPUT_DIR") or "./"
+    return os.path.join(output_dir, "manifests", f"{book_id(book_key or storybook.storybook_title)}.json")
+
+
+def plan_assets(storybook: Storybook, model: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Compute the (prompt hash, reference hash) of every illustration of the storybook.
+
+    The reference hash of a scene (or of the cover) combines the hashes of the
+    characters it uses, so editing a character invalidates every image drawn with it.
+
+    Args:
+        storybook: The storybook to illustrate.
+        model: Image model name, part of every prompt hash.
+
+    Returns:
+        Dict[str, Tuple[str, str]]: Hashes by asset key ("character:<name>",
+        "scene:<n>" with n the 1-based page position, "cover").
+    """
+    plan: Dict[str, Tuple[str, str]] = {}
+    character_hashes: Dict[str, str] = {}
+    for name, character in storybook.characters.items():
+        prompt_hash = hash_parts([model or "", character.character_prompt])
+        plan[f"character:{name}"] = (prompt_hash, "")
+        character_hashes[name] = prompt_hash
+
+    def reference_hash(names: List[str]) -> str:
+        return hash_parts(part for name in sorted(set(names)) for part in (name, character_hashes.get(name, "")))
+
+    for page_number, page in enumerate(storybook.pages, 1):
+        plan[f"scene:{page_number}"] = (hash_parts([model or "", page.scene_prompt]), reference_hash(page.characters))
+    plan["cover"] = (hash_parts([model or "", storybook.storybook_prompt]),
+                     reference_hash(list(storybook.characters)))
+    return plan
+
+
+class IllustrationManifest:
+    """
+    Record of the inputs and output of every illustration of a storybook:
+    asset key -> {"prompt_hash", "reference_hash", "path"}, along with a snapshot of
+    the storybook being illustrated and the assets whose last attempt failed.
+
+    Comparing a storybook against its manifest tells which images can be reused and
+    which must be generated again; the snapshot and the book key let an interrupted
+    run be resumed from the manifest alone.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.assets: Dict[str, dict] = {}
+        self.failures: Dict[str, str] = {}
+        self.storybook: Optional[dict] = None
+        self.book_key: Optional[str] = None
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.assets = data.get("assets", {})
+            self.failures = data.get("failures", {})
+            self.storybook = data.get("storybook")
+            self.book_key = data.get("book_key")
+
+    def reusable(self, key: str, prompt_hash: str, reference_hash: str) -> Optional[str]:
+        """Return the recorded image path if the asset's inputs are unchanged and the file still exists."""
+        with self._lock:
+            entry = self.assets.get(key)
+        if (entry and entry.get("prompt_hash") == prompt_hash and entry.get("reference_hash") == reference_hash
+                and entry.get("path") and os.path.exists(entry["path"])):
+            return entry["path"]
+        return None
+
+    def record(self, key: str, prompt_hash: str, reference_hash: str, path: str) -> None:
+        with self._lock:
+            self.assets[key] = {"prompt_hash": prompt_hash, "reference_hash": reference_hash, "path": path}
+            self.failures.pop(key, None)
+
+    def record_failure(self, key: str, error: str) -> None:
+        with self._lock:
+            self.failures[key] = error
+
+    def missing(self, plan: Dict[str, Tuple[str, str]]) -> List[str]:
+        """Keys of the planned assets that cannot be reused and still have to be generated."""
+        return [key for key, hashes in plan.items() if not self.reusable(key, *hashes)]
+
+    def prune(self, keys) -> None:
+        """Forget the assets whose key is not in `keys` (e.g. pages that were removed)."""
+        keys = set(keys)
+        with self._lock:
+            self.assets = {k: v for k, v in self.assets.items() if k in keys}
+            self.failures = {k: v for k, v in self.failures.items() if k in keys}
+
+    def save(self) -> None:
+        """Write the manifest atomically; called after every asset so a crash loses no finished image."""
+        with self._lock:
+            data = {"book_key": self.book_key, "storybook": self.storybook, "assets": self.assets,
+                    "failures": self.failures}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
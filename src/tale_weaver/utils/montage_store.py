@@ -0,0 +1,111 @@
+import os
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from tale_weaver.utils.disk_cache import DiskLRUCache, cache_root, hash_parts
+
+_store: Optional["MontageStore"] = None
+_store_lock = threading.Lock()
+
+
+@lru_cache(maxsize=256)
+def _pixel_digest(path: str, mtime_ns: int, size: int) -> str:
+    # mtime/size are part of the cache key so that rewritten files are hashed again
+    with Image.open(path) as img:
+        rgb = img.convert("RGB")
+        return hash_parts([f"{rgb.width}x{rgb.height}", rgb.tobytes()])
+
+
+def pixel_digest(path: str) -> str:
+    """Return a digest of the decoded RGB pixels of the image at `path`."""
+    st = os.stat(path)
+    return _pixel_digest(path, st.st_mtime_ns, st.st_size)
+
+
+class MontageStore:
+    """
+    Bounded, persistent store of character reference montages.
+
+    A montage is identified by the labels and the pixel content of the character
+    images it contains, regardless of their order or file names, so the same set
+    of characters maps to a single montage across scenes, books and restarts.
+
+    Args:
+        directory: Where montages are persisted.
+        max_entries: Maximum number of montages kept.
+        max_bytes: Total size budget of the stored montages.
+    """
+
+    def __init__(self, directory: str, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self._cache = DiskLRUCache(directory, suffix=".png", max_entries=max_entries, max_bytes=max_bytes)
+        self._lock = threading.Lock()
+        self._building: Dict[str, threading.Lock] = {}
+
+    def key_for(self, image_paths: List[str], label_for: Callable[[str], str]) -> Tuple[str, List[str]]:
+        """
+        Compute the content key of a montage.
+
+        Returns:
+            Tuple[str, List[str]]: The key and `image_paths` in canonical (label) order.
+        """
+        entries = sorted((label_for(p), pixel_digest(p), p) for p in image_paths)
+        key = hash_parts(part for label, digest, _ in entries for part in (label, digest))
+        return key, [p for _, _, p in entries]
+
+    def get_or_create(self, image_paths: List[str], label_for: Callable[[str], str],
+                      build: Callable[[List[str], str], str]) -> str:
+        """
+        Return the montage of `image_paths`, building it with `build` on a miss.
+
+        Args:
+            image_paths: Character images to merge.
+            label_for: Returns the label drawn for an image path.
+            build: Called as `build(ordered_paths, key)`; must return the path of a
+                newly written montage, which is then moved into the store.
+
+        Returns:
+            str: Path of the stored montage.
+        """
+        key, ordered = self.key_for(image_paths, label_for)
+        cached = self._cache.get(key)
+        if cached:
+            return cached
+
+        # Only one thread builds a given montage, the others wait and reuse it
+        with self._lock:
+            key_lock = self._building.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                cached = self._cache.get(key)
+                if cached:
+                    return cached
+                return self._cache.put(key, build(ordered, key), move=True)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        return self._cache.stats()
+
+
+def get_montage_store() -> MontageStore:
+    """
+    Return the process-wide montage store.
+
+    Configured through:
+        MONTAGE_CACHE_DIR: store directory (default `<cache root>/montages`).
+        MONTAGE_CACHE_MAX_ENTRIES: maximum number of montages (default 256).
+        MONTAGE_CACHE_MAX_MB: size budget in megabytes (default 256).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MontageStore(
+                directory=os.getenv("MONTAGE_CACHE_DIR") or os.path.join(cache_root(), "montages"),
+                max_entries=int(os.getenv("MONTAGE_CACHE_MAX_ENTRIES", "256")),
+                max_bytes=int(float(os.getenv("MONTAGE_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            )
+        return _store
@@ -7,9 +7,89 @@ from reportlab.platypus import Paragraph
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.utils import ImageReader
 from xml.sax.saxutils import escape
+from contextlib import contextmanager
+from dataclasses import dataclass
 from functools import lru_cache
-from PIL import Image, ImageFilter, ImageOps
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from PIL import Image, ImageFilter
+from tale_weaver.utils import tracing
+from tale_weaver.utils.disk_cache import DiskLRUCache, cache_root, hash_parts
+import numpy as np
+import gc
+import hashlib
+import io
 import os
+import tempfile
+import time
+import uuid
+import zlib
+
+def _hex_to_rgb(h):
+    h = h.lstrip("#")
+    return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+
+def _shade(rgb, delta):
+    r = max(0, min(255, rgb[0] + delta))
+    g = max(0, min(255, rgb[1] + delta))
+    b = max(0, min(255, rgb[2] + delta))
+    return (r, g, b)
+
+def parchment_texture(w_px: int, h_px: int, parchment_hex: str, grain_strength: float,
+                      blur_radius: float, seed: int = 0) -> Image.Image:
+    """
+    Synthesize a paper texture: seeded grain, blurred and contrast-stretched, darkening
+    and lightening the base color. The same arguments always give the same texture.
+    """
+    rgb = _hex_to_rgb(parchment_hex)
+    base = np.array(rgb, dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    noise = Image.fromarray(rng.integers(0, 256, size=(h_px, w_px), dtype=np.uint8), "L")
+    noise = np.asarray(noise.filter(ImageFilter.GaussianBlur(blur_radius)), dtype=np.float32)
+
+    # Autocontrast cutting 1% of the histogram on each side
+    lo, hi = np.percentile(noise, (1, 99))
+    noise = np.clip((noise - lo) * (255.0 / max(hi - lo, 1.0)), 0, 255).astype(np.uint8)
+
+    dark_mask = np.floor(noise * grain_strength)[..., None] / 255.0
+    light_mask = np.floor((255 - noise) * (grain_strength * 0.65))[..., None] / 255.0
+    darker = np.array(_shade(rgb, -18), dtype=np.float32)
+    lighter = np.array(_shade(rgb, +14), dtype=np.float32)
+
+    result = base + (darker - base) * dark_mask
+    result = result + (lighter - result) * light_mask
+    result = Image.fromarray(np.clip(result + 0.5, 0, 255).astype(np.uint8), "RGB")
+    return result.filter(ImageFilter.GaussianBlur(0.4))
+
+@lru_cache(maxsize=16)
+def parchment_reader(w_pt: float, h_pt: float, dpi: int, parchment_hex: str, grain_strength: float,
+                     blur_radius: float, seed: int = 0) -> ImageReader:
+    """
+    Return the paper texture for a page of `w_pt` x `h_pt` points as an ImageReader.
+
+    Textures are cached for the process lifetime and on disk (`PARCHMENT_CACHE_DIR`,
+    default `<cache root>/parchment`), so repeated exports skip the synthesis.
+    """
+    w_px = max(64, int(w_pt / 72.0 * dpi))
+    h_px = max(64, int(h_pt / 72.0 * dpi))
+    key = hash_parts(["parchment-v1", f"{w_px}x{h_px}", parchment_hex.lower(),
+                      repr(float(grain_strength)), repr(float(blur_radius)), str(seed)])
+    cache = _parchment_cache()
+    cached = cache.get(key)
+    if cached:
+        with Image.open(cached) as img:
+            return ImageReader(img.convert("RGB"))
+
+    texture = parchment_texture(w_px, h_px, parchment_hex, grain_strength, blur_radius, seed)
+    buf = io.BytesIO()
+    texture.save(buf, "PNG")
+    cache.put(key, buf.getvalue())
+    return ImageReader(texture)
+
+@lru_cache(maxsize=1)
+def _parchment_cache() -> DiskLRUCache:
+    return DiskLRUCache(os.getenv("PARCHMENT_CACHE_DIR") or os.path.join(cache_root(), "parchment"),
+                        suffix=".png", max_entries=64)
 
 def generate_storybook_pdf(
     storybook: dict,
@@ -17,7 +97,8 @@ def generate_storybook_pdf(
     parchment_hex: str = "#F5EEDD",
     grain_strength: float = 0.24,   
     blur_radius: float = 1.2,       
-    dpi: int = 150                  
+    dpi: int = 150,
+    texture_seed: int = 0
 ) -> str:
     """
     Generate a storybook-style PDF with parchment-like textured backgrounds, 
@@ -36,105 +117,261 @@ def generate_storybook_pdf(
         grain_strength (float, optional): Intensity of paper grain texture.
         blur_radius (float, optional): Blur radius applied to the parchment noise.
         dpi (int, optional): Resolution for generated textures.
+        texture_seed (int, optional): Seed of the parchment grain.
 
     Returns:
         str: Path to the saved PDF file.
     """
-    def draw_image(cnv, path, x, y, w, h):
-        try:
-            img = ImageReader(path)
-            iw, ih = img.getSize()
-            scale = min(w / iw, h / ih)
-            nw, nh = iw * scale, ih * scale
-            cnv.drawImage(img, x + (w - nw) / 2, y + (h - nh) / 2, nw, nh, mask='auto')
-        except Exception:
-            cnv.saveState()
-            cnv.setFont("Times-Italic", 10)
-            cnv.drawCentredString(x + w/2, y + h/2,
-                                  f"[Image not available: {os.path.basename(path or '')}]")
-            cnv.restoreState()
+    with tracing.span("pdf.export", book=storybook.get("storybook_title", ""),
+                      pages=len(storybook.get("pages", []))) as sp:
+        with _replacing(output_path) as tmp_path:
+            _render_storybook_pdf(storybook, tmp_path, parchment_hex, grain_strength, blur_radius, dpi,
+                                 texture_seed)
+        sp.set(bytes=os.path.getsize(output_path))
+    return output_path
 
-    def split_drop_cap(text: str):
-        t = (text or "").lstrip()
-        return (t[0], t[1:]) if t else ("", "")
 
-    def _hex_to_rgb(h):
-        h = h.lstrip("#")
-        return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+@dataclass
+class PdfExportReport:
+    """Outcome of `export_storybook_pdf`."""
+    output_path: str
+    output_bytes: int = 0
+    images_drawn: int = 0
+    unique_images: int = 0
+    source_image_bytes: int = 0
+    embedded_image_bytes: int = 0
+    render_seconds: float = 0.0
+    linearized: bool = False
+    chunks: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        """Bytes saved on illustrations compared to embedding the source files as they are."""
+        return self.source_image_bytes - self.embedded_image_bytes
+
+
+class _ImageOptimizer:
+    """
+    Resamples each illustration to `dpi` for the box it is drawn in, encodes it once
+    (JPEG or Flate) and reuses the result for identical images drawn at the same size.
+    With `reuse=False` encoded images are not kept once drawn (streaming export), but
+    sizes are still counted once per image and size, as the PDF embeds identical
+    images once: `bytes_saved` compares the same images either way.
+    """
+
+    def __init__(self, dpi: int, image_format: str, quality: int, report: PdfExportReport, reuse: bool = True):
+        image_format = image_format.upper()
+        if image_format not in {"JPEG", "FLATE"}:
+            raise ValueError(f"Unsupported image_format '{image_format}' (expected 'JPEG' or 'FLATE')")
+        self.dpi = dpi
+        self.image_format = image_format
+        self.quality = quality
+        self.report = report
+        self.reuse = reuse
+        self._sources: Dict[str, int] = {}
+        self._encoded: Dict[Tuple[str, int, int], ImageReader] = {}
+        self._embedded: Set[Tuple[str, int, int]] = set()
+
+    def prepare(self, path: str, w: float, h: float) -> Tuple[ImageReader, int, int]:
+        """
+        Return the reader to draw for `path` in a `w` x `h` points box, and the
+        source pixel size (used for the layout, so boxes match the unoptimized export).
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if digest not in self._sources:
+            self._sources[digest] = len(data)
+            self.report.source_image_bytes += len(data)
+
+        img = Image.open(io.BytesIO(data))
+        iw, ih = img.size
+        scale = min(w / iw, h / ih)
+        # Pixels needed to print the drawn box at the target DPI, never upscaling
+        tw = max(1, min(iw, round(iw * scale / 72.0 * self.dpi)))
+        th = max(1, min(ih, round(ih * scale / 72.0 * self.dpi)))
+
+        key = (digest, tw, th)
+        self.report.images_drawn += 1
+        reader = self._encoded.get(key)
+        if reader is None:
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            if (tw, th) != (iw, ih):
+                img = img.resize((tw, th), Image.Resampling.LANCZOS)
+            if self.image_format == "JPEG":
+                buf = io.BytesIO()
+                img.save(buf, "JPEG", quality=self.quality, optimize=True)
+                size = buf.tell()
+                buf.seek(0)
+                reader = ImageReader(buf)
+            else:
+                # ReportLab Flate-encodes raw pixel data itself
+                size = len(zlib.compress(img.tobytes())) if key not in self._embedded else 0
+                reader = ImageReader(img)
+            if self.reuse:
+                self._encoded[key] = reader
+            if key not in self._embedded:
+                self._embedded.add(key)
+                self.report.embedded_image_bytes += size
+                self.report.unique_images += 1
+        return reader, iw, ih
 
-    def _shade(rgb, delta):
-        r = max(0, min(255, rgb[0] + delta))
-        g = max(0, min(255, rgb[1] + delta))
-        b = max(0, min(255, rgb[2] + delta))
-        return (r, g, b)
 
-    @lru_cache(maxsize=4)
-    def parchment_reader(w_pt: float, h_pt: float) -> ImageReader:
-        """Create a paper texture as ImageReader (and cache it)."""
-        base_rgb = _hex_to_rgb(parchment_hex)
-        w_px = max(64, int(w_pt / 72.0 * dpi))
-        h_px = max(64, int(h_pt / 72.0 * dpi))
+def export_storybook_pdf(
+    storybook: dict,
+    output_path: str,
+    image_format: str = "JPEG",
+    image_quality: int = 85,
+    linearize: bool = False,
+    parchment_hex: str = "#F5EEDD",
+    grain_strength: float = 0.24,
+    blur_radius: float = 1.2,
+    dpi: int = 150,
+    texture_seed: int = 0
+) -> PdfExportReport:
+    """
+    Generate the storybook PDF (see `generate_storybook_pdf`) optimized for size and speed.
+
+    Each illustration is resampled to `dpi` for the box it is drawn in (never upscaled),
+    encoded once as JPEG or Flate, and identical images are embedded only once.
+
+    Args:
+        storybook (dict): Storybook content, as for `generate_storybook_pdf`.
+        output_path (str): File path to save the generated PDF.
+        image_format (str, optional): "JPEG" (lossy, smallest) or "FLATE" (lossless).
+        image_quality (int, optional): JPEG quality (1-95).
+        linearize (bool, optional): Rewrite the file linearized ("fast web view");
+            requires the optional `pikepdf` package, skipped with a warning otherwise.
+        parchment_hex, grain_strength, blur_radius, texture_seed: Parchment background settings.
+        dpi (int, optional): Target print resolution for illustrations and textures.
+
+    Returns:
+        PdfExportReport: Output size, bytes saved on illustrations and render time.
+    """
+    report = PdfExportReport(output_path=output_path)
+    optimizer = _ImageOptimizer(dpi, image_format, image_quality, report)
+    with tracing.span("pdf.export", book=storybook.get("storybook_title", ""),
+                      pages=len(storybook.get("pages", [])), optimized=True) as sp:
+        start = time.perf_counter()
+        with _replacing(output_path) as tmp_path:
+            _render_storybook_pdf(storybook, tmp_path, parchment_hex, grain_strength, blur_radius, dpi,
+                                 texture_seed, optimizer)
+            if linearize:
+                report.linearized = _linearize(tmp_path)
+        report.render_seconds = time.perf_counter() - start
+        report.output_bytes = os.path.getsize(output_path)
+        sp.set(bytes=report.output_bytes)
+    return report
 
-        base = Image.new("RGB", (w_px, h_px), base_rgb)
 
-        noise = Image.frombytes("L", (w_px, h_px), os.urandom(w_px * h_px))
-        noise = noise.filter(ImageFilter.GaussianBlur(blur_radius))
-        noise = ImageOps.autocontrast(noise, cutoff=1)
-        noise = noise.point(lambda x: int(x * grain_strength))
+@contextmanager
+def _replacing(output_path: str):
+    """
+    Yield a temporary path next to `output_path` to write the PDF to, moved over
+    `output_path` only once the block succeeds: a failed or interrupted export never
+    leaves a truncated file, nor replaces a previous export.
+    """
+    tmp_path = os.path.join(os.path.dirname(os.path.abspath(output_path)),
+                            f".{os.path.basename(output_path)}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-        darker = Image.new("RGB", (w_px, h_px), _shade(base_rgb, -18))
-        result = Image.composite(darker, base, noise)
 
-        light_mask = ImageOps.invert(noise).point(lambda x: int(x * (grain_strength * 0.65)))
-        lighter = Image.new("RGB", (w_px, h_px), _shade(base_rgb, +14))
-        result = Image.composite(lighter, result, light_mask)
+def _linearize(path: str) -> bool:
+    try:
+        import pikepdf
+    except ImportError:
+        print("pikepdf is not installed: PDF left non-linearized (pip install pikepdf).")
+        return False
+    tmp_path = f"{path}.linearized"
+    with pikepdf.open(path) as pdf:
+        pdf.save(tmp_path, linearize=True)
+    os.replace(tmp_path, path)
+    return True
 
-        result = result.filter(ImageFilter.GaussianBlur(0.4))
 
-        return ImageReader(result)
+class _StorybookCanvas:
+    """
+    Draws the storybook one page at a time: the cover (portrait A5), then one
+    landscape A5 spread per page, illustration on the left and text on the right.
+    """
 
-    def draw_parchment_bg(cnv, w, h):
-        bg = parchment_reader(w, h)
-        cnv.drawImage(bg, 0, 0, width=w, height=h, mask='auto')
+    def __init__(self, output_path: str, parchment_hex: str, grain_strength: float, blur_radius: float,
+                 dpi: int, texture_seed: int = 0, optimizer: Optional[_ImageOptimizer] = None):
+        self.canvas = canvas.Canvas(output_path, pagesize=portrait(A5))
+        self.parchment = (dpi, parchment_hex, grain_strength, blur_radius, texture_seed)
+        self.optimizer = optimizer
+        self.margin = 10 * mm
+        self.gap = 6 * mm
+        self.body_size, self.leading = 13, 18
+        self.body_style = ParagraphStyle("Body", fontName="Times-Roman", fontSize=self.body_size, leading=self.leading)
 
-    
-    c = canvas.Canvas(output_path, pagesize=portrait(A5))
-    pw, ph = portrait(A5)
-    margin = 10 * mm
-    gap = 6 * mm
+    def _draw_image(self, path, x, y, w, h):
+        cnv = self.canvas
+        try:
+            if self.optimizer:
+                img, iw, ih = self.optimizer.prepare(path, w, h)
+            else:
+                img = ImageReader(path)
+                iw, ih = img.getSize()
+            scale = min(w / iw, h / ih)
+            nw, nh = iw * scale, ih * scale
+            cnv.drawImage(img, x + (w - nw) / 2, y + (h - nh) / 2, nw, nh, mask='auto')
+        except Exception:
+            cnv.saveState()
+            cnv.setFont("Times-Italic", 10)
+            cnv.drawCentredString(x + w/2, y + h/2,
+                                  f"[Image not available: {os.path.basename(path or '')}]")
+            cnv.restoreState()
 
-    draw_parchment_bg(c, pw, ph)
-    cover_path = (storybook.get("storybook_image_path") or "").strip()
-    if cover_path:
-        draw_image(c, cover_path, margin, margin, pw - 2 * margin, ph - 2 * margin)
-    else:
-        c.setFont("Times-Bold", 24)
-        c.drawCentredString(pw/2, ph/2, storybook.get("storybook_title", ""))
+    def _draw_parchment_bg(self, w, h):
+        dpi, parchment_hex, grain_strength, blur_radius, texture_seed = self.parchment
+        bg = parchment_reader(w, h, dpi, parchment_hex, grain_strength, blur_radius, texture_seed)
+        self.canvas.drawImage(bg, 0, 0, width=w, height=h, mask='auto')
 
-    c.showPage()
+    @staticmethod
+    def _split_drop_cap(text: str):
+        t = (text or "").lstrip()
+        return (t[0], t[1:]) if t else ("", "")
 
-    pages = sorted(storybook.get("pages", []), key=lambda p: p.get("page_number", 0))
-    body_size, leading = 13, 18
-    body_style = ParagraphStyle("Body", fontName="Times-Roman", fontSize=body_size, leading=leading)
+    def cover(self, title: str, cover_path: Optional[str]):
+        c = self.canvas
+        pw, ph = portrait(A5)
+        c.setPageSize(portrait(A5))
+        self._draw_parchment_bg(pw, ph)
+        cover_path = (cover_path or "").strip()
+        if cover_path:
+            self._draw_image(cover_path, self.margin, self.margin, pw - 2 * self.margin, ph - 2 * self.margin)
+        else:
+            c.setFont("Times-Bold", 24)
+            c.drawCentredString(pw/2, ph/2, title)
+        c.showPage()
 
-    lpw, lph = landscape(A5)
-    for p in pages:
+    def page(self, p: dict):
+        c = self.canvas
+        margin, gap = self.margin, self.gap
+        lpw, lph = landscape(A5)
         c.setPageSize(landscape(A5))
-        draw_parchment_bg(c, lpw, lph)
+        self._draw_parchment_bg(lpw, lph)
 
         left_x, left_y = margin, margin
         left_w = (lpw - 2 * margin - gap) / 2
         left_h = lph - 2 * margin
-        draw_image(c, (p.get("scene_image_path") or "").strip(), left_x, left_y, left_w, left_h)
+        self._draw_image((p.get("scene_image_path") or "").strip(), left_x, left_y, left_w, left_h)
 
         right_x = margin + left_w + gap
         right_y = margin
         right_w = left_w
         right_h = left_h
 
-        cap, rest = split_drop_cap(p.get("scene_text", ""))
-        drop_html = f'<font size="{body_size*3:.0f}"><b>{escape(cap)}</b></font>{escape(rest)}'
-        para = Paragraph(drop_html, body_style)
+        cap, rest = self._split_drop_cap(p.get("scene_text", ""))
+        drop_html = f'<font size="{self.body_size*3:.0f}"><b>{escape(cap)}</b></font>{escape(rest)}'
+        para = Paragraph(drop_html, self.body_style)
         _, phgt = para.wrap(right_w, right_h)
         y_text = right_y + max(0, (right_h - phgt) / 2.0)
         para.drawOn(c, right_x, y_text)
@@ -143,5 +380,223 @@ def generate_storybook_pdf(
         c.drawRightString(right_x + right_w, 6, str(p.get("page_number", "")))
         c.showPage()
 
-    c.save()
-    return output_path
+    def save(self):
+        self.canvas.save()
+
+
+def _render_storybook_pdf(storybook: dict, output_path: str, parchment_hex: str,
+                          grain_strength: float, blur_radius: float, dpi: int, texture_seed: int = 0,
+                          optimizer: Optional[_ImageOptimizer] = None) -> None:
+    book = _StorybookCanvas(output_path, parchment_hex, grain_strength, blur_radius, dpi, texture_seed, optimizer)
+    book.cover(storybook.get("storybook_title", ""), storybook.get("storybook_image_path"))
+    for p in sorted(storybook.get("pages", []), key=lambda p: p.get("page_number", 0)):
+        book.page(p)
+    book.save()
+
+
+class _PdfAssembler:
+    """
+    Concatenates PDFs into one file, writing each input's objects as soon as they are
+    read: only one input is held in memory at a time. Identical images (the parchment
+    textures every chunk embeds, illustrations repeated across chunks) are written once.
+    Requires pypdf, used to parse the inputs.
+    """
+
+    def __init__(self, output_path: str):
+        self._out = open(output_path, "wb")
+        self._out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._offsets: List[int] = [0, 0]  # 1: catalog, 2: page tree (written last)
+        self._kids: List[int] = []
+        self._images: Dict[int, int] = {}
+
+    def _write(self, idnum: int, obj) -> None:
+        self._offsets[idnum - 1] = self._out.tell()
+        self._out.write(f"{idnum} 0 obj\n".encode("ascii"))
+        obj.write_to_stream(self._out)
+        self._out.write(b"\nendobj\n")
+
+    def append(self, path: str) -> None:
+        from pypdf import PdfReader
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+        reader = PdfReader(path)
+        mapping: Dict[int, int] = {}
+        pending = []
+
+        def visit(ref: IndirectObject) -> None:
+            if ref.idnum in mapping:
+                return
+            obj = ref.get_object()
+            if isinstance(obj, StreamObject) and obj.get("/Subtype") == "/Image" and "/SMask" not in obj:
+                digest = obj.hash_bin()
+                if digest in self._images:
+                    mapping[ref.idnum] = self._images[digest]
+                    return
+                self._images[digest] = len(self._offsets) + 1
+            self._offsets.append(0)
+            mapping[ref.idnum] = len(self._offsets)
+            pending.append((mapping[ref.idnum], obj))
+            for key, value in (obj.items() if isinstance(obj, DictionaryObject) else enumerate(obj)
+                               if isinstance(obj, ArrayObject) else ()):
+                if key != "/Parent":
+                    walk(value)
+
+        def walk(value) -> None:
+            if isinstance(value, IndirectObject):
+                visit(value)
+            elif isinstance(value, (DictionaryObject, ArrayObject)):
+                for item in (value.values() if isinstance(value, DictionaryObject) else value):
+                    walk(item)
+
+        def renumber(value):
+            if isinstance(value, IndirectObject):
+                return IndirectObject(mapping[value.idnum], 0, None)
+            if isinstance(value, DictionaryObject):
+                for key in list(value.keys()):
+                    value[key] = renumber(value.raw_get(key))
+            elif isinstance(value, ArrayObject):
+                for i, item in enumerate(value):
+                    value[i] = renumber(item)
+            return value
+
+        for page in reader.pages:
+            visit(page.indirect_reference)
+            self._kids.append(mapping[page.indirect_reference.idnum])
+        for idnum, obj in pending:
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Page":
+                obj[NameObject("/Parent")] = IndirectObject(2, 0, None)
+            self._write(idnum, renumber(obj))
+
+    def close(self) -> None:
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+
+        self._write(2, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(IndirectObject(k, 0, None) for k in self._kids),
+            NameObject("/Count"): NumberObject(len(self._kids)),
+        }))
+        self._write(1, DictionaryObject({NameObject("/Type"): NameObject("/Catalog"),
+                                         NameObject("/Pages"): IndirectObject(2, 0, None)}))
+        xref = self._out.tell()
+        lines = [f"xref\n0 {len(self._offsets) + 1}\n", "0000000000 65535 f \n"]
+        lines += [f"{offset:010d} 00000 n \n" for offset in self._offsets]
+        lines.append(f"trailer\n<< /Size {len(self._offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self._out.write("".join(lines).encode("ascii"))
+        self._out.close()
+
+
+def stream_storybook_pdf(
+    pages: Iterable[dict],
+    output_path: str,
+    title: str = "",
+    cover_path: Optional[str] = None,
+    chunk_pages: int = 0,
+    optimize_images: bool = False,
+    image_format: str = "JPEG",
+    image_quality: int = 85,
+    linearize: bool = False,
+    parchment_hex: str = "#F5EEDD",
+    grain_strength: float = 0.24,
+    blur_radius: float = 1.2,
+    dpi: int = 150,
+    texture_seed: int = 0
+) -> PdfExportReport:
+    """
+    Generate the storybook PDF (see `generate_storybook_pdf`) from an iterator of pages,
+    for long books and parallel exports.
+
+    Pages are drawn in the order they are produced, as they are produced: each
+    illustration is loaded, embedded and released before the next page is read, so
+    at most one decoded illustration (width x height x 3 bytes, 2.2 MB at 724x1024)
+    is held at a time, plus the two parchment textures. ReportLab still keeps the
+    compressed content of the pages drawn so far until the file is saved. With
+    `chunk_pages`, every `chunk_pages` pages are saved to a temporary PDF that is
+    appended to the output and deleted right away, which bounds that part to one chunk:
+
+        peak RSS ~ interpreter + 1 decoded illustration + 2 textures
+                   + compressed content of `chunk_pages` pages
+
+    whatever the page count. The chunked mode needs pypdf (to read the chunks back);
+    without it the export is done in a single pass. Textures and illustrations
+    repeated across chunks are embedded once, so the file is as large as a
+    single-pass export, but it is slower: ReportLab encodes images per document, so
+    every chunk encodes again the two textures and each illustration it draws.
+    Over 25 pages drawing 5 distinct illustrations, chunks of 7 pages take about
+    3x as long as a single pass (21s vs 7s); chunks holding the whole book cost
+    nothing extra. Use the largest chunks the memory budget allows.
+
+    Args:
+        pages: Page dicts ("page_number", "scene_image_path", "scene_text"), in order.
+        output_path (str): File path to save the generated PDF.
+        title (str, optional): Drawn on the cover when there is no cover image.
+        cover_path (str, optional): Cover illustration.
+        chunk_pages (int, optional): Pages per chunk; 0 renders in a single pass.
+            Smaller chunks use less memory but take longer (see above).
+        optimize_images (bool, optional): Resample and re-encode the illustrations
+            (see `export_storybook_pdf`); encoded images are not kept for reuse.
+        image_format, image_quality: Encoding of the optimized illustrations.
+        linearize (bool, optional): Rewrite the file linearized (requires `pikepdf`).
+        parchment_hex, grain_strength, blur_radius, texture_seed: Parchment background settings.
+        dpi (int, optional): Target print resolution for illustrations and textures.
+
+    Returns:
+        PdfExportReport: Output size, number of chunks and render time.
+    """
+    report = PdfExportReport(output_path=output_path)
+    optimizer = _ImageOptimizer(dpi, image_format, image_quality, report, reuse=False) if optimize_images else None
+    if chunk_pages > 0:
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            print("pypdf is not installed: PDF exported in a single pass (pip install pypdf).")
+            chunk_pages = 0
+
+    with tracing.span("pdf.export", book=title, streaming=True, chunk_pages=chunk_pages) as sp:
+        start = time.perf_counter()
+        page_count = 0
+        with _replacing(output_path) as tmp_path:
+            if not chunk_pages:
+                book = _StorybookCanvas(tmp_path, parchment_hex, grain_strength, blur_radius, dpi, texture_seed,
+                                        optimizer)
+                book.cover(title, cover_path)
+                for p in pages:
+                    book.page(p)
+                    page_count += 1
+                book.save()
+            else:
+                assembler = _PdfAssembler(tmp_path)
+                fd, chunk_path = tempfile.mkstemp(prefix=".chunk-", suffix=".pdf",
+                                                  dir=os.path.dirname(os.path.abspath(output_path)))
+                os.close(fd)
+                try:
+                    book = _StorybookCanvas(chunk_path, parchment_hex, grain_strength, blur_radius, dpi,
+                                            texture_seed, optimizer)
+                    book.cover(title, cover_path)
+                    in_chunk = 0
+                    for p in pages:
+                        if in_chunk == chunk_pages:
+                            book.save()
+                            assembler.append(chunk_path)
+                            report.chunks += 1
+                            # Canvases and pypdf readers are reference cycles: free the chunk now,
+                            # not at the next full collection
+                            book = None
+                            gc.collect()
+                            book = _StorybookCanvas(chunk_path, parchment_hex, grain_strength, blur_radius, dpi,
+                                                    texture_seed, optimizer)
+                            in_chunk = 0
+                        book.page(p)
+                        in_chunk += 1
+                        page_count += 1
+                    book.save()
+                    assembler.append(chunk_path)
+                    report.chunks += 1
+                finally:
+                    assembler.close()
+                    os.remove(chunk_path)
+            if linearize:
+                report.linearized = _linearize(tmp_path)
+        report.render_seconds = time.perf_counter() - start
+        report.output_bytes = os.path.getsize(output_path)
+        sp.set(bytes=report.output_bytes, pages=page_count)
+    return report
@@ -0,0 +1,188 @@
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+from tale_weaver.utils.console import print_line
+
+T = TypeVar("T")
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Default image quota: the lowest tier of the Gemini image models. Each call yields one image,
+# so requests and images per minute are the same quota.
+DEFAULT_REQUESTS_PER_MIN = 10
+
+
+def error_status(exc: BaseException) -> Optional[int]:
+    """Return the HTTP-like status carried by an API error (`code` or `status_code`), if any."""
+    for attr in ("code", "status_code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return error_status(exc) == 429 or "RESOURCE_EXHAUSTED" in str(exc)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return (is_rate_limited(exc) or error_status(exc) in _RETRYABLE_STATUS
+            or isinstance(exc, (ConnectionError, TimeoutError)))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_min` tokens per minute, holding at
+    most `burst` tokens. A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, rate_per_min: float, burst: Optional[float] = None):
+        self.rate_per_min = rate_per_min
+        self.burst = burst if burst is not None else max(1.0, rate_per_min / 60.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0, rate_scale: float = 1.0) -> float:
+        """
+        Block until `tokens` are available and take them.
+
+        Args:
+            tokens: Tokens to take.
+            rate_scale: Fraction of the configured rate currently allowed.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        if self.rate_per_min <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                rate = self.rate_per_min * rate_scale / 60.0
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / rate
+            time.sleep(delay)
+            waited += delay
+
+
+class AdaptiveRateLimiter:
+    """
+    Process-wide limiter for image generation calls, with retries.
+
+    Every call takes one token from the requests/min bucket; a call generates one
+    image, so this is also the image quota. A rate-limit error (429) halves the
+    allowed rate (at most once per `cooldown` seconds, so a burst of concurrent 429s
+    counts once); each success gives back `recovery` of the configured rate, up to
+    the full quota. Retryable errors are retried up to `max_retries` times with
+    exponential backoff and full jitter.
+
+    Args:
+        requests_per_min: Request quota (0 disables the bucket, and the adaptation with it).
+        max_retries: Retries after the first attempt.
+        backoff_base: First backoff ceiling in seconds, doubled at every retry.
+        backoff_max: Maximum backoff ceiling in seconds.
+        min_scale: Lowest fraction of the configured rate the adaptation can reach.
+        recovery: Fraction of the configured rate recovered per success.
+        cooldown: Minimum seconds between two rate reductions.
+    """
+
+    def __init__(self, requests_per_min: float = DEFAULT_REQUESTS_PER_MIN, max_retries: int = 5,
+                 backoff_base: float = 2.0, backoff_max: float = 60.0, min_scale: float = 0.1,
+                 recovery: float = 0.05, cooldown: float = 5.0):
+        self.requests = TokenBucket(requests_per_min)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_scale = min_scale
+        self.recovery = recovery
+        self.cooldown = cooldown
+        self.scale = 1.0
+        self._last_throttle = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveRateLimiter":
+        return cls(
+            requests_per_min=float(os.getenv("IMAGE_REQUESTS_PER_MIN", str(DEFAULT_REQUESTS_PER_MIN))),
+            max_retries=int(os.getenv("IMAGE_MAX_RETRIES", "5")),
+            backoff_base=float(os.getenv("IMAGE_BACKOFF_BASE", "2")),
+            backoff_max=float(os.getenv("IMAGE_BACKOFF_MAX", "60")),
+        )
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Run `fn` within the quota, retrying retryable errors.
+
+        Raises:
+            Exception: The last error when it is not retryable or retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            self.requests.acquire(rate_scale=self.scale)
+            with self._lock:
+                self.calls += 1
+            try:
+                result = fn()
+            except Exception as e:
+                if is_rate_limited(e):
+                    self._throttle()
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                print_line(f"Image request failed ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self._recover()
+            return result
+
+    def _throttle(self) -> None:
+        with self._lock:
+            self.throttled += 1
+            now = time.monotonic()
+            if now - self._last_throttle >= self.cooldown:
+                self._last_throttle = now
+                self.scale = max(self.min_scale, self.scale / 2)
+
+    def _recover(self) -> None:
+        with self._lock:
+            self.scale = min(1.0, self.scale + self.recovery)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"calls": self.calls, "retries": self.retries, "throttled": self.throttled,
+                    "failures": self.failures, "rate_scale": self.scale}
+
+
+_limiter: Optional[AdaptiveRateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_image_rate_limiter() -> AdaptiveRateLimiter:
+    """
+    Return the limiter shared by every image generation call of the process.
+
+    Configured through IMAGE_REQUESTS_PER_MIN (default 10, 0 = no limit), IMAGE_MAX_RETRIES,
+    IMAGE_BACKOFF_BASE and IMAGE_BACKOFF_MAX (seconds).
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveRateLimiter.from_env()
+        return _limiter
@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+
+class DependencyScheduler:
+    """
+    Run callables on a bounded thread pool, starting each one only when all the
+    tasks it depends on have completed.
+
+    Tasks can be submitted at any time (even while others are running); a task whose
+    dependencies are already satisfied starts immediately, the others wait until their
+    last dependency finishes. `on_start` receives the time each task waited for a free
+    worker once its dependencies were met. By default the first failure stops any further task
+    from starting and is re-raised by `join`. With `isolate_failures`, a failed task only
+    skips the tasks depending on it (directly or not); the others keep running and the
+    outcome is reported in `errors` and `skipped`.
+
+    Example:
+        scheduler = DependencyScheduler(max_workers=4)
+        scheduler.submit("a", make_a)
+        scheduler.submit("b", make_b, deps=["a"])
+        results = scheduler.join()
+    """
+
+    def __init__(self, max_workers: int = 4, on_complete: Optional[Callable[[str, Any], None]] = None,
+                 on_start: Optional[Callable[[str, float], None]] = None, isolate_failures: bool = False):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)),
+                                            thread_name_prefix="tale-weaver")
+        self._on_complete = on_complete
+        self._on_start = on_start
+        self._cond = threading.Condition()
+        self._waiting: Dict[str, tuple] = {}
+        self._running: Set[str] = set()
+        self._results: Dict[str, Any] = {}
+        self._error: Optional[BaseException] = None
+        self._isolate_failures = isolate_failures
+        self.errors: Dict[str, BaseException] = {}
+        self.skipped: Set[str] = set()
+
+    def submit(self, key: str, fn: Callable[[], Any], deps: Iterable[str] = ()) -> None:
+        """
+        Register a task.
+
+        Args:
+            key: Unique identifier of the task.
+            fn: Zero-argument callable producing the task result.
+            deps: Keys of the tasks that must complete before `fn` starts.
+
+        Raises:
+            ValueError: If a task with the same key was already submitted.
+        """
+        with self._cond:
+            if key in self._waiting or key in self._running or key in self._results or key in self.errors \
+                    or key in self.skipped:
+                raise ValueError(f"Task '{key}' already submitted")
+            self._waiting[key] = (fn, set(deps))
+            self._dispatch()
+
+    def join(self) -> Dict[str, Any]:
+        """
+        Wait until every submitted task has completed and shut the pool down.
+
+        Returns:
+            Dict[str, Any]: Task results by key.
+
+        Raises:
+            Exception: The first error raised by a task, unless failures are isolated.
+            RuntimeError: If some tasks depend on keys that were never submitted.
+        """
+        try:
+            with self._cond:
+                while self._running:
+                    self._cond.wait()
+                if self._error is not None:
+                    raise self._error
+                if self._waiting:
+                    missing = sorted({d for _, deps in self._waiting.values() for d in deps} - set(self._results))
+                    raise RuntimeError(f"Unresolved task dependencies: {', '.join(missing)}")
+                return dict(self._results)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def _dispatch(self) -> None:
+        # Caller must hold the condition lock
+        if self._error is not None:
+            return
+        if self.errors:
+            self._skip_blocked()
+        ready = [k for k, (_, deps) in self._waiting.items() if deps <= self._results.keys()]
+        for key in ready:
+            fn, _ = self._waiting.pop(key)
+            self._running.add(key)
+            self._executor.submit(self._execute, key, fn, time.perf_counter())
+
+    def _skip_blocked(self) -> None:
+        # Caller must hold the condition lock
+        blocked = True
+        while blocked:
+            failed = self.errors.keys() | self.skipped
+            blocked = [k for k, (_, deps) in self._waiting.items() if deps & failed]
+            for key in blocked:
+                del self._waiting[key]
+                self.skipped.add(key)
+
+    def _execute(self, key: str, fn: Callable[[], Any], ready_at: float) -> None:
+        try:
+            if self._on_start:
+                self._on_start(key, time.perf_counter() - ready_at)
+            result = fn()
+            if self._on_complete:
+                self._on_complete(key, result)
+        except BaseException as e:
+            with self._cond:
+                self._running.discard(key)
+                if self._isolate_failures and isinstance(e, Exception):
+                    self.errors[key] = e
+                    self._dispatch()
+                elif self._error is None:
+                    self._error = e
+                self._cond.notify_all()
+            return
+        with self._cond:
+            self._running.discard(key)
+            self._results[key] = result
+            self._dispatch()
+            self._cond.notify_all()
@@ -0,0 +1,63 @@
+import json
+import os
+from typing import Optional, Tuple
+
+import tale_weaver.utils.pdf_generator as pdf
+from tale_weaver.utils import tracing
+from tale_weaver.utils.disk_cache import env_flag
+from tale_weaver.utils.library import get_library
+
+
+def save_storybook(json_data: dict, output_dir: Optional[str] = None,
+                   language: Optional[str] = None, book_key: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Write the storybook JSON and its PDF export into the output directory, and add
+    the book to the library index.
+
+    Args:
+        json_data: The storybook as a dict (see `Storybook`).
+        output_dir: Destination directory; defaults to `OUTPUT_DIR` (or the current directory).
+        language: Language the story was written in, recorded in the library index.
+        book_key: Name of the files, unique per book (a batch item or job id); defaults
+            to the title, so a book with the same title overwrites them.
+
+    Returns:
+        Tuple[str, str]: Paths of the JSON file and of the PDF file.
+    """
+    # Absolute: the paths are recorded in the library index and returned to other processes
+    output_dir = os.path.abspath(output_dir or os.getenv("OUTPUT_DIR", "./"))
+    title = json_data.get("storybook_title", "storybook")
+    name = book_key or title
+    json_path = os.path.join(output_dir, "".join([name, ".json"]))
+    pdf_path = os.path.join(output_dir, "".join([name, ".pdf"]))
+
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(json_data, f, ensure_ascii=False, indent=2)
+    chunk_pages = int(os.getenv("PDF_CHUNK_PAGES", "0"))
+    if chunk_pages > 0:
+        # Memory-bounded export: one illustration and one chunk of pages in memory at a time
+        pages = sorted(json_data.get("pages", []), key=lambda p: p.get("page_number", 0))
+        report = pdf.stream_storybook_pdf(iter(pages), pdf_path, title=title,
+                                          cover_path=json_data.get("storybook_image_path"),
+                                          chunk_pages=chunk_pages,
+                                          optimize_images=env_flag("PDF_OPTIMIZE_IMAGES"),
+                                          image_format=os.getenv("PDF_IMAGE_FORMAT", "JPEG"),
+                                          image_quality=int(os.getenv("PDF_IMAGE_QUALITY", "85")),
+                                          linearize=env_flag("PDF_LINEARIZE"))
+        print(f"PDF saved to {pdf_path}: {report.output_bytes} bytes in {report.chunks or 1} chunks, "
+              f"{report.render_seconds:.2f}s")
+    elif env_flag("PDF_OPTIMIZE_IMAGES"):
+        report = pdf.export_storybook_pdf(json_data, pdf_path,
+                                          image_format=os.getenv("PDF_IMAGE_FORMAT", "JPEG"),
+                                          image_quality=int(os.getenv("PDF_IMAGE_QUALITY", "85")),
+                                          linearize=env_flag("PDF_LINEARIZE"))
+        print(f"PDF saved to {pdf_path}: {report.output_bytes} bytes, "
+              f"{report.bytes_saved} bytes saved on illustrations, {report.render_seconds:.2f}s")
+    else:
+        pdf.generate_storybook_pdf(json_data, pdf_path)
+    try:
+        get_library(output_dir).add(json_data, json_path, pdf_path, language=language)
+    except Exception as e:
+        print(f"Could not add {json_path} to the library index: {e}")
+    tracing.write_prometheus()
+    return json_path, pdf_path
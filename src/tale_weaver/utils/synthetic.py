@@ -0,0 +1,39 @@
+from tale_weaver.model.storybook import Storybook
+
+
+def synthetic_storybook(page_count: int = 10, character_count: int = 3, title: str = "Synthetic Storybook") -> Storybook:
+    """
+    Build a storybook with made-up prompts, for offline benchmarks and load tests.
+
+    Characters appear in the scenes round-robin, one to three per page, so scenes
+    exercise several distinct character montages.
+
+    Args:
+        page_count: Number of pages.
+        character_count: Number of characters (at least 1).
+        title: Storybook title.
+
+    Returns:
+        Storybook: A storybook without any image path.
+    """
+    names = [f"Character{i}" for i in range(1, max(1, character_count) + 1)]
+    characters = {
+        name: {"character_name": name,
+               "character_prompt": f"Create a picture of {name}, a friendly storybook hero. The image MUST be 724x1024 px."}
+        for name in names
+    }
+    pages = []
+    for n in range(1, page_count + 1):
+        in_scene = [names[(n + k) % len(names)] for k in range(min(len(names), 1 + n % 3))]
+        pages.append({
+            "page_number": n,
+            "scene_text": f"Page {n}. " + " ".join(f"{name} walks through the enchanted forest." for name in in_scene),
+            "characters": in_scene,
+            "scene_prompt": f"Create a picture of scene {n} with {', '.join(in_scene)}. The image MUST be 724x1024 px.",
+        })
+    return Storybook(
+        storybook_title=title,
+        storybook_prompt=f"Create a picture for the cover of '{title}'. The image MUST be 724x1024 px.",
+        characters=characters,
+        pages=pages,
+    )
@@ -0,0 +1,197 @@
+"""
+Lightweight span tracing for the generation pipeline.
+
+Tracing is off unless `TRACE_FILE` (JSONL span log) or `TRACE_METRICS_FILE`
+(Prometheus text snapshot) is set; when off, `span` and `tags` return a shared
+no-op object, so instrumented code pays one flag check per call.
+
+Usage:
+    with tracing.tags(book="My Book", asset="scene:3"):
+        with tracing.span("image.network") as sp:
+            data = backend.generate(prompt)
+            sp.set(bytes=len(data))
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_tags: contextvars.ContextVar = contextvars.ContextVar("tale_weaver_trace_tags", default={})
+_lock = threading.Lock()
+_configured = False
+_enabled = False
+_trace_file: Optional[str] = None
+_metrics_file: Optional[str] = None
+_metrics: Dict[str, dict] = {}
+
+
+class _Noop:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        return self
+
+
+_NOOP = _Noop()
+
+
+class Span:
+    """A timed operation; attributes can be added with `set` until it ends."""
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = {**_tags.get(), **attrs}
+        self.start = 0.0
+        self._t0 = 0.0
+
+    def set(self, **attrs) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self):
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        error = None if exc_type is None else f"{exc_type.__name__}: {exc}"
+        _record(self.name, self.start, time.perf_counter() - self._t0, self.attrs, error)
+        return False
+
+
+class _Tags:
+    def __init__(self, attrs: dict):
+        self.attrs = attrs
+        self._token = None
+
+    def __enter__(self):
+        self._token = _tags.set({**_tags.get(), **self.attrs})
+        return self
+
+    def __exit__(self, *exc):
+        _tags.reset(self._token)
+        return False
+
+
+def configure(trace_file: Optional[str] = None, metrics_file: Optional[str] = None) -> None:
+    """
+    Enable tracing explicitly; by default it is configured from `TRACE_FILE` and
+    `TRACE_METRICS_FILE` on first use. Passing no file disables it.
+    """
+    global _configured, _enabled, _trace_file, _metrics_file
+    with _lock:
+        _trace_file = trace_file
+        _metrics_file = metrics_file
+        _enabled = bool(trace_file or metrics_file)
+        if _enabled and not _configured:
+            atexit.register(write_prometheus)
+        _configured = True
+
+
+def enabled() -> bool:
+    if not _configured:
+        configure(os.getenv("TRACE_FILE") or None, os.getenv("TRACE_METRICS_FILE") or None)
+    return _enabled
+
+
+def span(name: str, **attrs):
+    """Time the enclosed block; `attrs` (and the active `tags`) are attached to the span."""
+    if not enabled():
+        return _NOOP
+    return Span(name, attrs)
+
+
+def tags(**attrs):
+    """Attach `attrs` (e.g. book, asset) to every span opened in the enclosed block."""
+    if not enabled():
+        return _NOOP
+    return _Tags(attrs)
+
+
+def record_span(name: str, start: float, duration: float, error: Optional[str] = None, **attrs) -> None:
+    """
+    Record a span measured elsewhere.
+
+    Args:
+        name: Span name.
+        start: Start time as a UNIX timestamp.
+        duration: Duration in seconds.
+        error: Error description if the operation failed.
+    """
+    if not enabled():
+        return
+    _record(name, start, duration, {**_tags.get(), **attrs}, error)
+
+
+def _record(name: str, start: float, duration: float, attrs: dict, error: Optional[str]) -> None:
+    with _lock:
+        m = _metrics.setdefault(name, {"count": 0, "sum": 0.0, "errors": 0, "bytes": 0,
+                                       "buckets": [0] * len(_BUCKETS)})
+        m["count"] += 1
+        m["sum"] += duration
+        m["errors"] += error is not None
+        m["bytes"] += int(attrs.get("bytes") or 0)
+        for i, bound in enumerate(_BUCKETS):
+            if duration <= bound:
+                m["buckets"][i] += 1
+        if _trace_file:
+            record = {"name": name, "start": start, "duration": duration,
+                      "thread": threading.current_thread().name, "attrs": attrs}
+            if error:
+                record["error"] = error
+            with open(_trace_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_snapshot() -> str:
+    """Return the aggregated spans in the Prometheus text exposition format."""
+    lines: List[str] = [
+        "# HELP tale_weaver_span_seconds Duration of traced operations.",
+        "# TYPE tale_weaver_span_seconds histogram",
+    ]
+    with _lock:
+        metrics = {name: {**m, "buckets": list(m["buckets"])} for name, m in _metrics.items()}
+    for name, m in sorted(metrics.items()):
+        label = f'span="{_escape(name)}"'
+        for bound, count in zip(_BUCKETS, m["buckets"]):
+            lines.append(f'tale_weaver_span_seconds_bucket{{{label},le="{bound}"}} {count}')
+        lines.append(f'tale_weaver_span_seconds_bucket{{{label},le="+Inf"}} {m["count"]}')
+        lines.append(f"tale_weaver_span_seconds_sum{{{label}}} {m['sum']:.6f}")
+        lines.append(f"tale_weaver_span_seconds_count{{{label}}} {m['count']}")
+    lines += ["# HELP tale_weaver_span_errors_total Traced operations that raised.",
+              "# TYPE tale_weaver_span_errors_total counter"]
+    lines += [f'tale_weaver_span_errors_total{{span="{_escape(n)}"}} {m["errors"]}' for n, m in sorted(metrics.items())]
+    lines += ["# HELP tale_weaver_span_bytes_total Bytes produced by traced operations.",
+              "# TYPE tale_weaver_span_bytes_total counter"]
+    lines += [f'tale_weaver_span_bytes_total{{span="{_escape(n)}"}} {m["bytes"]}' for n, m in sorted(metrics.items())]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Optional[str] = None) -> Optional[str]:
+    """
+    Write the Prometheus snapshot to `path` (default `TRACE_METRICS_FILE`).
+
+    Returns:
+        Optional[str]: The written path, or None when there is nowhere to write.
+    """
+    path = path or _metrics_file
+    if not path:
+        return None
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_snapshot())
+    os.replace(tmp_path, path)
+    return path